@@ -1,14 +1,25 @@
 import streamlit as st
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, text, inspect
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 import re
-from visualization_generator import VisualizationGenerator, display_visualization
+import threading
+import atexit
+import logging
+from visualization_generator import VisualizationGenerator, display_visualization, load_plotting
+from statistics_catalog import StatisticsCatalog, catalog_path
+from conversation_context import ConversationContext
+from result_export import ResultExporter, EXPORT_FORMATS
+from sql_candidates import CandidateSelector
+from render_cache import RenderCache, data_fingerprint
 
 load_dotenv()
 
+logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+logging.getLogger("sql_candidates").setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
+
 #Armazenei os dados na AWS (RDS MySQL)
 MYSQL_CONFIG = {
     'host': os.getenv('MYSQL_HOST'),
@@ -18,17 +29,52 @@ MYSQL_CONFIG = {
     'port': int(os.getenv('MYSQL_PORT', 3306))
 }
 
+#URL SQLAlchemy completa que substitui a conexão MySQL (ex.: SQLite local nos testes de carga)
+DATABASE_URL = os.getenv('DATABASE_URL')
+
+#Quantidade de queries candidatas geradas por pergunta (1 desativa a seleção por custo)
+SQL_CANDIDATES = int(os.getenv('SQL_CANDIDATES') or 1)
+
 class DatabaseChatbot:
-    def __init__(self):
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        connection_string = (
-            f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}@"
-            f"{MYSQL_CONFIG['host']}:{MYSQL_CONFIG['port']}/{MYSQL_CONFIG['database']}"
-        )
-        self.engine = create_engine(connection_string)
+    def __init__(self, catalog=None):
+        self.catalog = catalog
+        self._openai_client = None
+        self._engine = None
+        self._schema = None
+        #Protege a criação preguiçosa dos clientes e do esquema contra a thread de warm-up
+        self._lock = threading.RLock()
+        self.candidate_selector = CandidateSelector(self, SQL_CANDIDATES, f"`{MYSQL_CONFIG['database']}`.neurotech")
+    
+    #Clientes criados sob demanda para não pesar no início de cada sessão
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            with self._lock:
+                if self._openai_client is None:
+                    from openai import OpenAI
+                    self._openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._openai_client
+    
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    connection_string = DATABASE_URL or (
+                        f"mysql+pymysql://{MYSQL_CONFIG['user']}:{MYSQL_CONFIG['password']}@"
+                        f"{MYSQL_CONFIG['host']}:{MYSQL_CONFIG['port']}/{MYSQL_CONFIG['database']}"
+                    )
+                    self._engine = create_engine(connection_string)
+        return self._engine
         
-    def get_table_schema(self):
-        try:
+    def load_table_schema(self):
+        """Consulta esquema e amostra da tabela; erros são propagados para quem chamou."""
+        #O esquema não muda durante a sessão, então é consultado uma única vez
+        if self._schema is not None:
+            return self._schema
+        with self._lock:
+            if self._schema is not None:
+                return self._schema
             with self.engine.connect() as conn:
                 schema_query = """
                 SELECT COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_DEFAULT, COLUMN_COMMENT
@@ -36,16 +82,43 @@ class DatabaseChatbot:
                 WHERE TABLE_SCHEMA = 'neurotech' AND TABLE_NAME = 'neurotech'
                 ORDER BY ORDINAL_POSITION;
                 """
-                schema_df = pd.read_sql(schema_query, conn)
+                if self.engine.dialect.name == 'sqlite':
+                    #SQLite não tem INFORMATION_SCHEMA; o inspector do SQLAlchemy devolve as mesmas informações
+                    columns = inspect(conn).get_columns('neurotech')
+                    schema_df = pd.DataFrame({
+                        'COLUMN_NAME': [c['name'] for c in columns],
+                        'DATA_TYPE': [str(c['type']) for c in columns],
+                        'IS_NULLABLE': ['YES' if c['nullable'] else 'NO' for c in columns],
+                        'COLUMN_DEFAULT': [c.get('default') for c in columns],
+                        'COLUMN_COMMENT': [c.get('comment') or '' for c in columns]
+                    })
+                else:
+                    schema_df = pd.read_sql(schema_query, conn)
                 
                 sample_query = "SELECT * FROM neurotech LIMIT 5;"
                 sample_df = pd.read_sql(sample_query, conn)
                 
-                return schema_df, sample_df
+                self._schema = (schema_df, sample_df)
+                return self._schema
+
+    def get_table_schema(self):
+        try:
+            return self.load_table_schema()
         except Exception as e:
             st.error(f"Erro ao obter esquema: {e}")
             return None, None
 
+    def build_schema_info(self, schema_df):
+        schema_info = schema_df.to_string() if schema_df is not None else ""
+        if self.catalog is not None:
+            schema_info += f"\n\nESTATÍSTICAS DA TABELA:\n{self.catalog.to_prompt()}"
+        return schema_info
+
+    def answer_from_catalog(self, question):
+        if self.catalog is None:
+            return None
+        return self.catalog.answer_question(question)
+
     def execute_sql_query(self, query):
         try:
             with self.engine.connect() as conn:
@@ -53,7 +126,14 @@ class DatabaseChatbot:
         except Exception as e:
             return f"Erro na execução da query: {e}"
 
-    def generate_sql_from_question(self, question, schema_info):
+    def generate_sql_from_question(self, question, schema_info, previous_sql=None, temperature=0):
+        previous_context = ""
+        if previous_sql:
+            previous_context = f"""
+        CONSULTA ANTERIOR (a pergunta pode ser um refinamento dela):
+        {previous_sql}
+        """
+        
         context = f"""
         Você é um especialista em SQL e análise de dados de inadimplência. 
         
@@ -77,7 +157,7 @@ class DatabaseChatbot:
         3. Para perguntas sobre inadimplência, use TARGET (1 = inadimplente, 0 = adimplente)
         4. Sempre limite os resultados quando apropriado (use LIMIT)
         5. Use nomes de colunas exatos conforme mostrado no esquema
-        
+        {previous_context}
         PERGUNTA DO USUÁRIO: {question}
         
         SQL:
@@ -88,13 +168,18 @@ class DatabaseChatbot:
                 model="gpt-3.5-turbo", #não acho que nessa aplicação precisamos de um modelo mais robusto
                 messages=[{"role": "user", "content": context}],
                 max_tokens=200,
-                temperature=0
+                temperature=temperature
             )
             sql_query = response.choices[0].message.content.strip()
             return re.sub(r'^```sql\s*|```\s*$', '', sql_query).strip()
         except Exception as e:
             return f"Erro ao gerar SQL: {e}"
 
+    def generate_best_sql(self, question, schema_info, previous_sql=None):
+        if self.candidate_selector.candidate_count > 1:
+            return self.candidate_selector.select(question, schema_info, previous_sql)
+        return self.generate_sql_from_question(question, schema_info, previous_sql)
+
     def explain_results(self, question, sql_query, results):
         if isinstance(results, str):
             return results
@@ -123,6 +208,98 @@ class DatabaseChatbot:
         except Exception as e:
             return f"Erro ao explicar resultados: {e}"
 
+@st.cache_resource
+def load_catalog(path):
+    return StatisticsCatalog.load(path)
+
+#Compartilhado entre sessões: as chaves são derivadas do conteúdo dos resultados
+@st.cache_resource
+def load_render_cache():
+    return RenderCache()
+
+#Um exportador por processo: diretório temporário e threads compartilhados entre as sessões
+@st.cache_resource
+def load_exporter():
+    exporter = ResultExporter()
+    atexit.register(exporter.close)
+    return exporter
+
+def display_result(message_index, question, sql_query, data, render_keys=None, show_chart=True):
+    """Exibe tabela e gráfico do resultado a partir do cache de renderização e retorna as chaves usadas."""
+    cache = load_render_cache()
+    render_keys = render_keys or {}
+    
+    table_key = render_keys.get("table") or f"table:{data_fingerprint(data)}"
+    st.dataframe(cache.table(table_key, data), use_container_width=True)
+    
+    chart_key = render_keys.get("chart")
+    if show_chart:
+        chart_key = display_visualization(
+            st.session_state.viz_generator, question, sql_query, data,
+            cache=cache, cache_key=chart_key, key=f"chart_{message_index}"
+        )
+    return {"table": table_key, "chart": chart_key}
+
+def warm_up(chatbot):
+    """Pré-carrega esquema, bibliotecas de gráficos e cliente do LLM antes da primeira pergunta.
+
+    Roda numa thread sem contexto do Streamlit, então falhas vão para o log e não para a página;
+    a primeira pergunta tenta de novo e mostra o erro normalmente.
+    """
+    try:
+        chatbot.load_table_schema()
+        load_plotting()
+        chatbot.openai_client
+    except Exception as e:
+        logger.warning("Erro no warm-up: %s", e)
+
+@st.fragment(run_every="2s")
+def display_export_progress(job):
+    #Ao terminar, recarrega a página para sair do polling e mostrar o botão de download
+    if job.status != 'running':
+        st.rerun()
+    st.caption(f"⏳ Exportando... {job.rows:,} linhas gravadas")
+
+def display_export_controls(message_index, sql_query):
+    job = st.session_state.export_jobs.get(message_index)
+    if job is not None and job.status == 'expired':
+        #Arquivo apagado pelo TTL; volta a oferecer a exportação
+        del st.session_state.export_jobs[message_index]
+        job = None
+    if job is None:
+        for col, export_format in zip(st.columns(len(EXPORT_FORMATS) + 3), EXPORT_FORMATS):
+            if col.button(f"Exportar {export_format.upper()}", key=f"export_{export_format}_{message_index}"):
+                job = load_exporter().start(st.session_state.chatbot.engine, sql_query, export_format)
+                st.session_state.export_jobs[message_index] = job
+                st.rerun()
+    elif job.status == 'running':
+        display_export_progress(job)
+    elif job.status == 'done':
+        #O arquivo só é lido quando o usuário clica em baixar
+        st.download_button(
+            f"⬇️ Baixar {job.format.upper()} ({job.rows:,} linhas)", job.read,
+            file_name=job.file_name, mime=job.mime_type, on_click="ignore", key=f"download_{message_index}"
+        )
+    else:
+        st.error(job.error)
+
+def display_local_answer(prompt, answer, caption):
+    sql_query, results, explanation = answer
+    message_index = len(st.session_state.messages)
+    st.code(sql_query, language="sql")
+    render_keys = display_result(message_index, prompt, sql_query, results, show_chart=len(results) > 1)
+    st.markdown(explanation)
+    st.caption(caption)
+    st.session_state.messages.append({
+        "role": "assistant",
+        "content": f"**SQL equivalente:**\n```sql\n{sql_query}\n```\n\n**Explicação:**\n{explanation}",
+        "dataframe": results,
+        "sql": sql_query,
+        "question": prompt,
+        "render": render_keys
+    })
+    display_export_controls(len(st.session_state.messages) - 1, sql_query)
+
 def main():
     st.set_page_config(page_title="Consulta SQL", layout="wide")
     
@@ -133,15 +310,29 @@ def main():
         st.error("⚠️ OPENAI_API_KEY não está configurada. Configure no arquivo .env")
         return
     
+    if 'catalog' not in st.session_state:
+        st.session_state.catalog = load_catalog(catalog_path())
+    
     if 'chatbot' not in st.session_state:
-        st.session_state.chatbot = DatabaseChatbot()
+        st.session_state.chatbot = DatabaseChatbot(st.session_state.catalog)
+        if os.getenv("CHATSQL_WARM_UP", "").lower() in ("1", "true"):
+            threading.Thread(target=warm_up, args=(st.session_state.chatbot,), daemon=True).start()
     
     if 'viz_generator' not in st.session_state:
-        st.session_state.viz_generator = VisualizationGenerator()
+        st.session_state.viz_generator = VisualizationGenerator(st.session_state.catalog)
     
     if 'messages' not in st.session_state:
         st.session_state.messages = []
     
+    if 'context' not in st.session_state:
+        st.session_state.context = ConversationContext()
+    
+    if 'export_jobs' not in st.session_state:
+        st.session_state.export_jobs = {}
+    
+    #Remove exportações expiradas de qualquer sessão a cada interação
+    load_exporter().cleanup()
+    
     st.subheader("💬 Converse com seus dados")
     
     with st.expander("💡 Exemplos de perguntas que você pode fazer"):
@@ -152,11 +343,19 @@ def main():
         - Mostre a inadimplência por sexo
         """)
     
-    for message in st.session_state.messages:
+    for i, message in enumerate(st.session_state.messages):
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
-            if "dataframe" in message:
+            #Tabelas e gráficos do histórico vêm do cache, sem reconverter dados nem refazer figuras
+            if "render" in message:
+                display_result(
+                    i, message["question"], message["sql"], message["dataframe"],
+                    message["render"], show_chart=message["render"]["chart"] is not None
+                )
+            elif "dataframe" in message:
                 st.dataframe(message["dataframe"])
+            if "sql" in message:
+                display_export_controls(i, message["sql"])
     
     if prompt := st.chat_input("Faça sua pergunta sobre os dados..."):
         st.session_state.messages.append({"role": "user", "content": prompt})
@@ -165,28 +364,49 @@ def main():
         
         with st.chat_message("assistant"):
             with st.spinner("Analisando sua pergunta..."):
+                context = st.session_state.context
+                
+                #Refinamentos do resultado anterior (filtro, ordenação, top N) são resolvidos em memória
+                follow_up = context.try_follow_up(prompt)
+                if follow_up is not None:
+                    display_local_answer(prompt, follow_up, "Resposta calculada a partir do resultado anterior, sem nova consulta ao banco.")
+                    context.update(prompt, follow_up[0], follow_up[1])
+                    return
+                
+                instant = st.session_state.chatbot.answer_from_catalog(prompt)
+                if instant is not None:
+                    display_local_answer(prompt, instant, "Resposta obtida do catálogo de estatísticas, sem consulta ao banco.")
+                    context.update(prompt, instant[0], instant[1])
+                    return
+                
                 schema_df, sample_df = st.session_state.chatbot.get_table_schema()
-                schema_info = schema_df.to_string() if schema_df is not None else ""
+                schema_info = st.session_state.chatbot.build_schema_info(schema_df)
                 
-                sql_query = st.session_state.chatbot.generate_sql_from_question(prompt, schema_info)
+                sql_query = st.session_state.chatbot.generate_best_sql(
+                    prompt, schema_info, context.follow_up_sql(prompt)
+                )
                 
                 st.code(sql_query, language="sql")
                 
                 results = st.session_state.chatbot.execute_sql_query(sql_query)
                 
                 if isinstance(results, pd.DataFrame):
-                    st.dataframe(results, use_container_width=True)
-                    
-                    display_visualization(st.session_state.viz_generator, prompt, sql_query, results)
+                    message_index = len(st.session_state.messages)
+                    render_keys = display_result(message_index, prompt, sql_query, results)
                     
                     explanation = st.session_state.chatbot.explain_results(prompt, sql_query, results)
                     st.markdown(explanation)
+                    context.update(prompt, sql_query, results)
                     
                     st.session_state.messages.append({
                         "role": "assistant", 
                         "content": f"**SQL gerada:**\n```sql\n{sql_query}\n```\n\n**Explicação:**\n{explanation}",
-                        "dataframe": results
+                        "dataframe": results,
+                        "sql": sql_query,
+                        "question": prompt,
+                        "render": render_keys
                     })
+                    display_export_controls(len(st.session_state.messages) - 1, sql_query)
                 else:
                     st.error(results)
                     st.session_state.messages.append({
@@ -0,0 +1,191 @@
+import re
+import pandas as pd
+from statistics_catalog import normalize_text
+
+FOLLOW_UP_PATTERN = re.compile(r'^(e |agora|so |somente|apenas|filtr|orden|classifiqu|top|mostre so|mostre apenas)')
+FILTER_PATTERN = re.compile(r'(?:^e|\bso|\bsomente|\bapenas|\bfiltre|\bfiltrar)\b\s+(.+)$')
+SORT_PATTERN = re.compile(r'\b(?:orden\w*|classifiqu\w*)\s+(?:por|pela|pelo|pelas|pelos)\s+(?:a |o )?(\w+)')
+TOP_PATTERN = re.compile(r'\b(?:top|primeir[oa]s|maiores|menores)\s*(\d+)|\b(\d+)\s+(?:primeir[oa]s|maiores|menores)\b')
+LIMIT_PATTERN = re.compile(r'\blimit\s+(\d+)(?:\s*,\s*(\d+))?(?:\s+offset\s+\d+)?\s*;?\s*$', re.IGNORECASE)
+
+#Palavras neutras que podem sobrar no trecho de filtro sem mudar seu significado
+FILTER_STOPWORDS = {
+    'para', 'pra', 'por', 'com', 'os', 'as', 'o', 'a', 'de', 'do', 'da', 'dos', 'das', 'em', 'no', 'na',
+    'e', 'agora', 'mostre', 'clientes', 'cliente', 'registros', 'que', 'sao', 'estado', 'uf', 'sexo',
+    'classe', 'social', 'mesmo', 'mesma', 'isso', 'so', 'somente', 'apenas',
+}
+
+#Palavras que podem acompanhar uma ordenação explícita ("ordene por taxa, crescente")
+SORT_WORDS = {'crescente', 'decrescente', 'asc', 'desc', 'ordem', 'maior', 'menor', 'maiores', 'menores'}
+
+#Sem coluna de ordenação, "top N" precisa ser a pergunta inteira (fora o trecho de filtro)
+TOP_ONLY_WORDS = {'e', 'agora'}
+
+#Sinônimos para valores codificados nas colunas da tabela
+VALUE_SYNONYMS = {
+    'VAR2': {'mulheres': 'F', 'mulher': 'F', 'feminino': 'F', 'homens': 'M', 'homem': 'M', 'masculino': 'M'},
+    'TARGET': {'inadimplentes': 1, 'inadimplente': 1, 'maus pagadores': 1, 'adimplentes': 0, 'adimplente': 0, 'bons pagadores': 0},
+}
+
+
+def _sql_literal(value):
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(value)
+
+
+class ConversationContext:
+    def __init__(self):
+        self.last_question = None
+        self.last_sql = None
+        self.last_result = None
+
+    def update(self, question, sql_query, result):
+        self.last_question = question
+        self.last_sql = sql_query
+        self.last_result = result
+
+    def has_result(self):
+        return isinstance(self.last_result, pd.DataFrame) and not self.last_result.empty
+
+    def follow_up_sql(self, question):
+        """SQL anterior a ser enviado ao LLM quando a pergunta parece um refinamento que não pôde ser resolvido localmente."""
+        if self.last_sql and FOLLOW_UP_PATTERN.search(normalize_text(question).strip()):
+            return self.last_sql
+        return None
+
+    def _resolve_filters(self, text):
+        """Converte o trecho de filtro em condições (coluna, valor) sobre o último resultado.
+
+        Retorna None se alguma palavra do trecho não puder ser resolvida localmente.
+        """
+        df = self.last_result
+        conditions = []
+        remaining = f" {text} "
+        for column, synonyms in VALUE_SYNONYMS.items():
+            for word, value in synonyms.items():
+                if re.search(rf'\b{word}\b', remaining):
+                    if column not in df.columns:
+                        return None
+                    conditions.append((column, value))
+                    remaining = re.sub(rf'\b{word}\b', ' ', remaining)
+                    break
+
+        classe = re.search(r'\bclasse (\w+)', remaining)
+        if classe and 'VAR8' in df.columns:
+            for value in df['VAR8'].dropna().unique():
+                if normalize_text(str(value)) == classe.group(1):
+                    conditions.append(('VAR8', value))
+                    remaining = remaining.replace(classe.group(0), ' ')
+                    break
+
+        tokens = re.findall(r'\w+', remaining)
+        for column in df.select_dtypes(include=['object', 'string', 'category']).columns:
+            if any(c == column for c, _ in conditions):
+                continue
+            for value in df[column].dropna().unique():
+                value_text = normalize_text(str(value))
+                #Valores de uma letra só são aceitos via "classe X" para evitar casar artigos
+                if len(value_text) > 1 and value_text in tokens:
+                    conditions.append((column, value))
+                    tokens = [t for t in tokens if t != value_text]
+                    break
+
+        if any(t not in FILTER_STOPWORDS for t in tokens):
+            return None
+        return conditions
+
+    def _truncated(self):
+        """Indica se o último resultado foi cortado por um LIMIT no nível externo do SQL anterior."""
+        match = LIMIT_PATTERN.search(self.last_sql or '')
+        if not match:
+            return False
+        limit = int(match.group(2) or match.group(1))
+        return len(self.last_result) >= limit
+
+    def _resolve_column(self, word):
+        #Nome exato ou uma parte inteira separada por "_" (ex.: "taxa" em taxa_inadimplencia)
+        for column in self.last_result.columns:
+            name = normalize_text(str(column))
+            if word == name or word in name.split('_'):
+                return column
+        return None
+
+    def try_follow_up(self, question):
+        """Tenta responder a pergunta transformando o último resultado. Retorna (sql, DataFrame, texto) ou None."""
+        if not self.has_result():
+            return None
+
+        q = normalize_text(question).strip().rstrip('?.!').strip()
+        if not FOLLOW_UP_PATTERN.search(q):
+            return None
+
+        df = self.last_result
+        where, order_by, limit = [], None, None
+        steps = []
+
+        sort_match = SORT_PATTERN.search(q)
+        top_match = TOP_PATTERN.search(q)
+        cut = min([m.start() for m in (sort_match, top_match) if m], default=len(q))
+        filter_match = FILTER_PATTERN.search(q[:cut])
+
+        #Toda palavra fora dos trechos reconhecidos precisa ser neutra; do contrário é uma pergunta nova
+        leftover = q
+        for match in (filter_match, sort_match, top_match):
+            if match:
+                leftover = leftover[:match.start()] + ' ' * (match.end() - match.start()) + leftover[match.end():]
+        if top_match and not sort_match:
+            allowed = TOP_ONLY_WORDS
+        else:
+            allowed = FILTER_STOPWORDS | SORT_WORDS if sort_match else FILTER_STOPWORDS
+        if any(t not in allowed for t in re.findall(r'\w+', leftover)):
+            return None
+
+        #Com o resultado anterior cortado por LIMIT, filtros e top N dependem de linhas que não foram trazidas
+        if (filter_match or top_match) and self._truncated():
+            return None
+
+        if filter_match:
+            conditions = self._resolve_filters(filter_match.group(1))
+            if not conditions:
+                return None
+            mask = pd.Series(True, index=df.index)
+            for column, value in conditions:
+                mask &= df[column] == value
+                where.append(f"{column} = {_sql_literal(value)}")
+                steps.append(f"{column} = {value}")
+            df = df[mask]
+
+        if sort_match or top_match:
+            ascending = bool(re.search(r'\b(crescente|asc|menor|menores)\b', q))
+            if sort_match:
+                column = self._resolve_column(sort_match.group(1))
+            else:
+                numeric = df.select_dtypes(include='number').columns
+                column = numeric[-1] if len(numeric) else None
+            if column is None:
+                return None
+            df = df.sort_values(column, ascending=ascending, kind='stable')
+            order_by = f"{column} {'ASC' if ascending else 'DESC'}"
+            steps.append(f"ordenado por {column} ({'crescente' if ascending else 'decrescente'})")
+
+        if top_match:
+            limit = int(top_match.group(1) or top_match.group(2))
+            df = df.head(limit)
+            steps.append(f"primeiros {limit}")
+
+        if not steps:
+            return None
+
+        #SQL equivalente aplicado sobre a consulta anterior, para manter o histórico reproduzível
+        sql_query = f"SELECT * FROM (\n{self.last_sql.strip().rstrip(';')}\n) AS anterior"
+        if where:
+            sql_query += "\nWHERE " + " AND ".join(where)
+        if order_by:
+            sql_query += f"\nORDER BY {order_by}"
+        if limit is not None:
+            sql_query += f"\nLIMIT {limit}"
+        sql_query += ";"
+
+        explanation = f"Resultado anterior refinado localmente ({'; '.join(steps)}): {len(df)} registro(s)."
+        return sql_query, df.reset_index(drop=True), explanation
@@ -0,0 +1,356 @@
+"""Teste de carga do app Streamlit com LLM e banco locais.
+
+Executa N sessões simuladas do fluxo real de main() (via AppTest do Streamlit) contra um
+servidor stub compatível com a API da OpenAI e um SQLite com dados no formato da tabela
+neurotech, aumentando a concorrência a cada etapa.
+
+Uso:
+    python load_test.py --sessions 1 2 4 8 --questions 5 --llm-latency 0.3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'chat.py')
+
+UFS = ['SP', 'RJ', 'MG', 'BA', 'RS', 'PR', 'PE', 'CE', 'SC', 'GO']
+
+QUESTIONS = [
+    "Qual UF tem mais inadimplência?",
+    "Quantos clientes por sexo?",
+    "Qual a distribuição de idade dos inadimplentes?",
+    "Quantos inadimplentes existem em SP?",
+    "Mostre a inadimplência por classe social e sexo",
+    "Qual a idade média?",
+]
+
+#Respostas do stub para cada palavra-chave da pergunta; todas são SQL válida no SQLite
+STUB_SQL = [
+    ('uf', "SELECT VAR5, COUNT(*) AS total, AVG(TARGET) AS taxa FROM neurotech GROUP BY VAR5 ORDER BY taxa DESC"),
+    ('sexo', "SELECT VAR2, COUNT(*) AS total FROM neurotech GROUP BY VAR2"),
+    ('idade', "SELECT IDADE, TARGET FROM neurotech WHERE TARGET = 1 LIMIT 2000"),
+    ('sp', "SELECT COUNT(*) AS inadimplentes FROM neurotech WHERE TARGET = 1 AND VAR5 = 'SP'"),
+    ('classe', "SELECT VAR8, VAR2, COUNT(*) AS total, AVG(TARGET) AS taxa FROM neurotech GROUP BY VAR8, VAR2"),
+]
+
+
+def seed_database(path, rows, seed=42):
+    """Cria um SQLite com a tabela neurotech e retorna o DataFrame gerado."""
+    from sqlalchemy import create_engine
+
+    rng = np.random.default_rng(seed)
+    months = pd.date_range('2017-01-01', periods=12, freq='MS').strftime('%Y-%m-%d 00:00:00+00:00')
+    df = pd.DataFrame({
+        'REF_DATE': rng.choice(months, rows),
+        'TARGET': (rng.random(rows) < 0.25).astype(int),
+        'VAR2': rng.choice(['M', 'F'], rows),
+        'IDADE': rng.integers(18, 90, rows).astype(float),
+        'VAR4': rng.choice(['S', None], rows, p=[0.02, 0.98]),
+        'VAR5': rng.choice(UFS, rows),
+        'VAR8': rng.choice(['A', 'B', 'C', 'D', 'E'], rows),
+    })
+    engine = create_engine(f"sqlite:///{path}")
+    df.to_sql('neurotech', engine, index=False, if_exists='replace')
+    engine.dispose()
+    return df
+
+
+class StubLLMServer:
+    """Servidor local compatível com /v1/chat/completions, com latência configurável."""
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                content = stub.respond(body['messages'][-1]['content'])
+                payload = json.dumps({
+                    'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()),
+                    'model': body.get('model', 'stub'),
+                    'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+                    'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def respond(self, prompt):
+        with self._lock:
+            self.requests += 1
+        time.sleep(self.latency)
+        if 'PERGUNTA DO USUÁRIO:' not in prompt:
+            return "Explicação simulada dos resultados."
+        question = prompt.split('PERGUNTA DO USUÁRIO:')[-1].split('SQL:')[0].lower()
+        for keyword, sql in STUB_SQL:
+            if keyword in question:
+                return sql
+        return "SELECT COUNT(*) AS total FROM neurotech"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PoolMonitor:
+    """Acompanha conexões em uso em todos os pools do SQLAlchemy do processo."""
+
+    def __init__(self):
+        self.in_use = {}
+        self.capacity = {}
+        self.peak_total = 0
+        self.peak_utilization = 0.0
+        self.connections_opened = 0
+        self.pools_used = set()
+        self._owners = {}
+        self._lock = threading.Lock()
+
+    def install(self):
+        from sqlalchemy import event
+        from sqlalchemy.pool import Pool
+        event.listen(Pool, 'connect', self._on_connect)
+        event.listen(Pool, 'checkout', self._on_checkout)
+        event.listen(Pool, 'checkin', self._on_checkin)
+        return self
+
+    def uninstall(self):
+        from sqlalchemy import event
+        from sqlalchemy.pool import Pool
+        event.remove(Pool, 'connect', self._on_connect)
+        event.remove(Pool, 'checkout', self._on_checkout)
+        event.remove(Pool, 'checkin', self._on_checkin)
+
+    def reset(self):
+        with self._lock:
+            self.peak_total = sum(self.in_use.values())
+            self.peak_utilization = 0.0
+            self.connections_opened = 0
+            self.pools_used = set()
+
+    def _on_connect(self, dbapi_connection, record):
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_checkout(self, dbapi_connection, record, proxy):
+        pool = proxy._pool
+        key = id(pool)
+        with self._lock:
+            if key not in self.capacity:
+                #Capacidade do QueuePool = pool_size + max_overflow; outros pools contam uma conexão
+                size = pool.size() if hasattr(pool, 'size') else 1
+                self.capacity[key] = max(size + max(getattr(pool, '_max_overflow', 0), 0), 1)
+            self._owners[id(dbapi_connection)] = key
+            self.pools_used.add(key)
+            self.in_use[key] = self.in_use.get(key, 0) + 1
+            self.peak_total = max(self.peak_total, sum(self.in_use.values()))
+            self.peak_utilization = max(self.peak_utilization, self.in_use[key] / self.capacity[key])
+
+    def _on_checkin(self, dbapi_connection, record):
+        with self._lock:
+            key = self._owners.pop(id(dbapi_connection), None)
+            if key is not None:
+                self.in_use[key] -= 1
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        #ru_maxrss é o pico (em KB no Linux), usado quando /proc não está disponível
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@contextmanager
+def concurrent_app_tests():
+    """Permite várias sessões do AppTest em paralelo no mesmo processo.
+
+    O AppTest foi feito para uma sessão por vez: cada execução instala um Runtime global e o
+    remove ao terminar, além de recompilar o script. Aqui o Runtime nunca "desaparece" para as
+    outras sessões e o script é compilado uma única vez (ast.parse não é seguro entre threads
+    no CPython 3.11), como acontece no servidor real.
+    """
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    last_runtime = {}
+    shared_cache = ScriptCache()
+    get_bytecode = ScriptCache.get_bytecode
+
+    def instance(cls):
+        if cls._instance is not None:
+            last_runtime['runtime'] = cls._instance
+        return last_runtime['runtime']
+
+    with patch.object(Runtime, 'instance', classmethod(instance)), \
+            patch.object(Runtime, 'exists', classmethod(lambda cls: True)), \
+            patch.object(ScriptCache, 'get_bytecode', lambda self, path: get_bytecode(shared_cache, path)):
+        yield
+
+
+def run_session(questions, latencies, errors, timeout):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.run()
+    for question in questions:
+        start = time.perf_counter()
+        at.chat_input[0].set_value(question).run()
+        latencies.append(time.perf_counter() - start)
+        if at.exception:
+            errors.append(str(at.exception[0].value))
+    return at
+
+
+def has_catalog(at):
+    return 'catalog' in at.session_state and at.session_state['catalog'] is not None
+
+
+def run_step(sessions, questions_per_session, monitor, timeout=120):
+    latencies, errors, apps = [], [], []
+    rss_before = rss_bytes()
+    monitor.reset()
+
+    def worker(index):
+        #Cada sessão começa numa pergunta diferente para misturar a carga
+        questions = [QUESTIONS[(index + i) % len(QUESTIONS)] for i in range(questions_per_session)]
+        try:
+            apps.append(run_session(questions, latencies, errors, timeout))
+        except Exception as e:
+            errors.append(f"Sessão {index}: {e}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    ordered = sorted(latencies)
+    percentile = lambda q: float(np.percentile(ordered, q)) if ordered else 0.0
+    return {
+        'sessoes': sessions,
+        'perguntas': len(latencies),
+        'vazao_por_s': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_s': percentile(50),
+        'p95_s': percentile(95),
+        'p99_s': percentile(99),
+        'media_s': statistics.fmean(ordered) if ordered else 0.0,
+        'memoria_por_sessao_mb': max(rss_after - rss_before, 0) / sessions / 1024 / 1024,
+        'conexoes_abertas': monitor.connections_opened,
+        'pools': len(monitor.pools_used),
+        'pico_conexoes_em_uso': monitor.peak_total,
+        'pico_saturacao_pool': monitor.peak_utilization,
+        'sessoes_com_catalogo': sum(has_catalog(at) for at in apps),
+        'erros': len(errors),
+    }
+
+
+def run_load_test(levels, questions_per_session=3, llm_latency=0.0, rows=20000, work_dir=None):
+    """Sobe o stub do LLM e o SQLite, configura o app via variáveis de ambiente e executa a rampa."""
+    work_dir = work_dir or tempfile.mkdtemp(prefix='chatsql_load_')
+    db_path = os.path.join(work_dir, 'neurotech.db')
+    catalog_path = os.path.join(work_dir, 'neurotech_stats.json')
+    df = seed_database(db_path, rows)
+
+    stub = StubLLMServer(latency=llm_latency).start()
+    env = {
+        'OPENAI_API_KEY': 'stub',
+        'OPENAI_BASE_URL': stub.base_url,
+        'DATABASE_URL': f"sqlite:///{db_path}",
+        'STATS_CATALOG_PATH': catalog_path,
+        'SQL_CANDIDATES': '1',
+    }
+    previous_env = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+
+    from statistics_catalog import build_statistics_catalog, save_catalog
+    save_catalog(build_statistics_catalog(df), catalog_path)
+
+    monitor = PoolMonitor().install()
+    try:
+        with concurrent_app_tests():
+            #Sessão de aquecimento fora da medição, para que imports e caches do processo não contem como memória por sessão
+            run_session(QUESTIONS[:1], [], [], timeout=120)
+            results = [run_step(sessions, questions_per_session, monitor) for sessions in levels]
+    finally:
+        monitor.uninstall()
+        stub.stop()
+        for key, value in previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return results
+
+
+def print_report(results):
+    headers = [
+        ('sessoes', 'Sessões', '{:d}'), ('perguntas', 'Perguntas', '{:d}'), ('vazao_por_s', 'Vazão/s', '{:.2f}'),
+        ('p50_s', 'p50 (s)', '{:.3f}'), ('p95_s', 'p95 (s)', '{:.3f}'), ('p99_s', 'p99 (s)', '{:.3f}'),
+        ('memoria_por_sessao_mb', 'MB/sessão', '{:.1f}'), ('pools', 'Pools', '{:d}'),
+        ('conexoes_abertas', 'Conexões abertas', '{:d}'), ('pico_conexoes_em_uso', 'Conexões em uso', '{:d}'),
+        ('pico_saturacao_pool', 'Saturação pool', '{:.0%}'), ('sessoes_com_catalogo', 'Com catálogo', '{:d}'),
+        ('erros', 'Erros', '{:d}'),
+    ]
+    rows = [[fmt.format(r[key]) for key, _, fmt in headers] for r in results]
+    widths = [max(len(title), *(len(row[i]) for row in rows)) for i, (_, title, _) in enumerate(headers)]
+    print(' | '.join(title.rjust(w) for (_, title, _), w in zip(headers, widths)))
+    print('-+-'.join('-' * w for w in widths))
+    for row in rows:
+        print(' | '.join(value.rjust(w) for value, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do ChatSQL com LLM e banco locais")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8], help="Sessões simultâneas em cada etapa da rampa")
+    parser.add_argument('--questions', type=int, default=3, help="Perguntas por sessão")
+    parser.add_argument('--llm-latency', type=float, default=0.2, help="Latência simulada do LLM por chamada (s)")
+    parser.add_argument('--rows', type=int, default=20000, help="Linhas geradas na tabela neurotech")
+    parser.add_argument('--json', action='store_true', help="Imprime os resultados em JSON")
+    args = parser.parse_args()
+
+    results = run_load_test(args.sessions, args.questions, args.llm_latency, args.rows)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
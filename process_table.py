@@ -3,6 +3,7 @@ from sqlalchemy import create_engine
 import pymysql #O SQLAlchemy precisa de um driver como pymysql ou mysqlclient
 import os
 from dotenv import load_dotenv
+from statistics_catalog import build_statistics_catalog, save_catalog, catalog_path
 
 load_dotenv()
 
@@ -40,6 +41,9 @@ try:
     df_selected.to_csv(output_csv_path, index=False)
     print(f"\nDados selecionados salvos em {output_csv_path}")
 
+    save_catalog(build_statistics_catalog(df_selected))
+    print(f"Catálogo de estatísticas salvo em {catalog_path()}")
+
     mysql_host = os.getenv('MYSQL_HOST')
     mysql_user = os.getenv('MYSQL_USER')
     mysql_password = os.getenv('MYSQL_PASSWORD')
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+RENDER_CACHE_MB = float(os.getenv('RENDER_CACHE_MB') or 64)
+
+
+def data_fingerprint(df):
+    """Hash do conteúdo do DataFrame (valores, índice, colunas e tipos)."""
+    digest = hashlib.sha1()
+    digest.update(repr(list(zip(df.columns.astype(str), df.dtypes.astype(str)))).encode())
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    except TypeError:
+        digest.update(df.to_json(date_format='iso').encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Cache LRU de figuras (JSON serializado) e tabelas Arrow com limite de memória."""
+
+    def __init__(self, max_bytes=int(RENDER_CACHE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            #Itens maiores que o limite inteiro não são guardados
+            if size > self.max_bytes:
+                return value
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+        return value
+
+    def figure(self, key, build):
+        """Retorna (figura como dict, mensagem), gerando e serializando a figura apenas na primeira vez."""
+        cached = self.get(key)
+        if cached is None:
+            chart, message = build()
+            fig_json = chart.to_json() if chart is not None and hasattr(chart, 'to_json') else None
+            cached = self.put(key, (fig_json, message), len(fig_json or '') + len(message))
+            if fig_json is None and chart is not None:
+                return chart, message
+        fig_json, message = cached
+        return (json.loads(fig_json) if fig_json is not None else None), message
+
+    def table(self, key, df):
+        """Retorna a tabela Arrow do DataFrame, evitando a conversão pandas -> Arrow a cada rerun."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        try:
+            import pyarrow as pa
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except Exception:
+            return df
+        return self.put(key, table, table.nbytes)
@@ -0,0 +1,141 @@
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from sqlalchemy import text
+
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE') or 10000)
+#Tempo que um arquivo exportado fica disponível para download antes de ser apagado
+EXPORT_TTL_MINUTES = float(os.getenv('EXPORT_TTL_MINUTES') or 60)
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class ExportJob:
+    def __init__(self, sql_query, export_format, path):
+        self.sql_query = sql_query
+        self.format = export_format
+        self.path = path
+        self.rows = 0
+        self.status = 'running'
+        self.error = None
+        self.future = None
+        self.finished_at = None
+
+    @property
+    def mime_type(self):
+        return EXPORT_FORMATS[self.format]
+
+    @property
+    def file_name(self):
+        return os.path.basename(self.path)
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+def _write_csv(result, columns, path, chunk_size, job):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in result.partitions(chunk_size):
+            writer.writerows(rows)
+            job.rows += len(rows)
+
+
+def _write_parquet(result, columns, path, chunk_size, job):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for rows in result.partitions(chunk_size):
+            table = pa.Table.from_pandas(pd.DataFrame.from_records(rows, columns=columns), preserve_index=False)
+            if writer is None:
+                #Colunas só com nulos no primeiro bloco não definem um tipo; usa string como tipo geral
+                schema = pa.schema([
+                    pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f for f in table.schema
+                ])
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table.cast(writer.schema))
+            job.rows += len(rows)
+        if writer is None:
+            pq.write_table(pa.table({col: pa.array([], pa.string()) for col in columns}), path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+class ResultExporter:
+    """Exporta o resultado completo de uma query em segundo plano, lendo o banco em blocos.
+
+    Pensado para uma instância por processo: o diretório e as threads são compartilhados entre as sessões,
+    e os arquivos são apagados `ttl` segundos depois de prontos.
+    """
+
+    def __init__(self, export_dir=None, chunk_size=EXPORT_CHUNK_SIZE, max_workers=2, ttl=EXPORT_TTL_MINUTES * 60):
+        self._owns_dir = export_dir is None
+        self.export_dir = export_dir or tempfile.mkdtemp(prefix='chatsql_export_')
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.jobs = []
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def start(self, engine, sql_query, export_format='csv'):
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato de exportação não suportado: {export_format}")
+        self.cleanup()
+
+        with self._lock:
+            self._counter += 1
+            path = os.path.join(self.export_dir, f"resultado_{self._counter}.{export_format}")
+            job = ExportJob(sql_query, export_format, path)
+            self.jobs.append(job)
+
+        job.future = self.executor.submit(self._run, engine, job)
+        return job
+
+    def cleanup(self, now=None):
+        """Apaga os arquivos de exportações concluídas há mais de `ttl` segundos e retorna quantas expiraram."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [job for job in self.jobs if job.finished_at is not None and now - job.finished_at > self.ttl]
+            self.jobs = [job for job in self.jobs if job not in expired]
+        for job in expired:
+            job.status = 'expired'
+            if os.path.exists(job.path):
+                os.remove(job.path)
+        return len(expired)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._owns_dir:
+            shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def _run(self, engine, job):
+        writers = {'csv': _write_csv, 'parquet': _write_parquet}
+        try:
+            #stream_results usa um cursor no servidor (SSCursor no PyMySQL), então só um bloco fica em memória
+            with engine.connect() as conn:
+                result = conn.execution_options(
+                    stream_results=True, max_row_buffer=self.chunk_size
+                ).execute(text(job.sql_query))
+                writers[job.format](result, list(result.keys()), job.path, self.chunk_size, job)
+            job.status = 'done'
+        except Exception as e:
+            job.status = 'error'
+            job.error = f"Erro na exportação: {e}"
+            if os.path.exists(job.path):
+                os.remove(job.path)
+        finally:
+            job.finished_at = time.time()
+        return job
@@ -0,0 +1,141 @@
+import json
+import logging
+import math
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+#A primeira temperatura (0) reproduz a resposta do modo de candidato único
+CANDIDATE_TEMPERATURES = [0, 0.5, 0.8, 1.0, 1.2]
+SAMPLE_ROWS = 1000
+
+
+def sample_query(sql_query, table_ref, sample_rows=SAMPLE_ROWS):
+    """Reescreve a query para rodar sobre uma amostra da tabela, sombreando `neurotech` com uma CTE."""
+    sql = sql_query.strip().rstrip(';')
+    sql = re.sub(r'\b\w+\.neurotech\b', 'neurotech', sql)
+    cte = f"neurotech AS (SELECT * FROM {table_ref} LIMIT {sample_rows})"
+
+    recursive = re.match(r'(?i)\s*with\s+recursive\s+', sql)
+    if recursive:
+        return f"WITH RECURSIVE {cte}, {sql[recursive.end():]}"
+    plain = re.match(r'(?i)\s*with\s+', sql)
+    if plain:
+        return f"WITH {cte}, {sql[plain.end():]}"
+    return f"WITH {cte} {sql}"
+
+
+def parse_explain_cost(explain_json):
+    plan = json.loads(explain_json)
+    cost = plan.get('query_block', {}).get('cost_info', {}).get('query_cost')
+    return float(cost) if cost is not None else math.inf
+
+
+def result_fingerprint(df):
+    """Assinatura do resultado que ignora nomes de colunas e ordem das linhas."""
+    normalized = df.copy()
+    for col in normalized.select_dtypes(include='number').columns:
+        normalized[col] = normalized[col].astype(float).round(6)
+    rows = normalized.astype(str).values.tolist()
+    return len(normalized.columns), tuple(sorted(map(tuple, rows)))
+
+
+class SelectionStats:
+    def __init__(self):
+        self.selections = 0
+        self.cheaper_wins = 0
+        self.disagreements = 0
+        self.baseline_cost = 0.0
+        self.chosen_cost = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, baseline, chosen, disagreement):
+        with self._lock:
+            self.selections += 1
+            self.disagreements += int(disagreement)
+            if baseline is None or not math.isfinite(baseline['cost']) or not math.isfinite(chosen['cost']):
+                return
+            self.baseline_cost += baseline['cost']
+            self.chosen_cost += chosen['cost']
+            if chosen['cost'] < baseline['cost']:
+                self.cheaper_wins += 1
+
+    def summary(self):
+        with self._lock:
+            savings = 1 - self.chosen_cost / self.baseline_cost if self.baseline_cost else 0.0
+            return {
+                'selecoes': self.selections,
+                'vitorias_plano_mais_barato': self.cheaper_wins,
+                'divergencias': self.disagreements,
+                'economia_media_custo': savings,
+            }
+
+
+#Compartilhado entre sessões para acompanhar o ganho no processo inteiro
+SELECTION_STATS = SelectionStats()
+
+
+class CandidateSelector:
+    def __init__(self, chatbot, candidate_count, table_ref, stats=SELECTION_STATS):
+        self.chatbot = chatbot
+        self.candidate_count = min(candidate_count, len(CANDIDATE_TEMPERATURES))
+        self.table_ref = table_ref
+        self.stats = stats
+
+    def generate(self, question, schema_info, previous_sql=None):
+        temperatures = CANDIDATE_TEMPERATURES[:self.candidate_count]
+        with ThreadPoolExecutor(max_workers=len(temperatures)) as executor:
+            candidates = list(executor.map(
+                lambda t: self.chatbot.generate_sql_from_question(question, schema_info, previous_sql, temperature=t),
+                temperatures
+            ))
+        #Remove duplicatas mantendo a ordem (a primeira é sempre a de temperatura 0)
+        unique = {}
+        for sql in candidates:
+            unique.setdefault(re.sub(r'\s+', ' ', sql.strip().rstrip(';')).lower(), sql)
+        return list(unique.values())
+
+    def evaluate(self, sql_query):
+        candidate = {'sql': sql_query, 'cost': math.inf, 'fingerprint': None, 'error': None}
+        if not re.match(r'(?i)\s*(select|with)\b', sql_query) or not re.search(r'(?i)\bneurotech\b', sql_query):
+            candidate['error'] = "Candidato não é uma consulta sobre a tabela neurotech"
+            return candidate
+        try:
+            with self.chatbot.engine.connect() as conn:
+                explain = conn.execute(text(f"EXPLAIN FORMAT=JSON {sql_query.strip().rstrip(';')}")).scalar()
+                candidate['cost'] = parse_explain_cost(explain)
+                sample = pd.read_sql(text(sample_query(sql_query, self.table_ref)), conn)
+                candidate['fingerprint'] = result_fingerprint(sample)
+        except Exception as e:
+            candidate['error'] = str(e)
+        return candidate
+
+    def select(self, question, schema_info, previous_sql=None):
+        sql_candidates = self.generate(question, schema_info, previous_sql)
+        with ThreadPoolExecutor(max_workers=len(sql_candidates)) as executor:
+            evaluated = list(executor.map(self.evaluate, sql_candidates))
+
+        valid = [c for c in evaluated if c['error'] is None]
+        if not valid:
+            logger.info("Seleção de SQL: nenhum dos %d candidatos passou no EXPLAIN", len(evaluated))
+            return sql_candidates[0]
+
+        #Fica com o grupo de candidatos que concorda no resultado da amostra e, nele, o de menor custo
+        groups = Counter(c['fingerprint'] for c in valid)
+        majority, _ = groups.most_common(1)[0]
+        agreeing = [c for c in valid if c['fingerprint'] == majority]
+        chosen = min(agreeing, key=lambda c: c['cost'])
+
+        baseline = evaluated[0] if evaluated[0]['error'] is None else None
+        self.stats.record(baseline, chosen, disagreement=len(groups) > 1)
+        logger.info(
+            "Seleção de SQL: %d candidatos, %d válidos, %d concordantes; custo escolhido=%s, custo base=%s; %s",
+            len(evaluated), len(valid), len(agreeing), chosen['cost'],
+            baseline['cost'] if baseline else None, self.stats.summary()
+        )
+        return chosen['sql']
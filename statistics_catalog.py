@@ -0,0 +1,240 @@
+import json
+import os
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+DEFAULT_CATALOG_PATH = 'neurotech_stats.json'
+
+CATEGORICAL_COLUMNS = ['TARGET', 'VAR2', 'VAR4', 'VAR5', 'VAR8']
+NUMERIC_COLUMNS = ['IDADE']
+DATE_COLUMNS = ['REF_DATE']
+DIMENSION_COLUMNS = ['VAR2', 'VAR4', 'VAR5', 'VAR8']
+
+#Chave do grupo de valores nulos nas taxas por dimensão (o JSON não aceita None como chave)
+NULL_KEY = '__null__'
+
+HISTOGRAM_BINS = 20
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+#Palavras de preenchimento removidas antes de comparar a pergunta com os formatos suportados
+FILLER_WORDS = {
+    'qual', 'quais', 'e', 'eh', 'a', 'o', 'as', 'os', 'de', 'da', 'do', 'das', 'dos', 'me', 'mostre',
+    'informe', 'diga', 'temos', 'existem', 'ha', 'tem', 'sao', 'valor', 'tabela', 'base', 'neurotech',
+}
+
+#Formatos de pergunta respondidos pelo catálogo; a pergunta inteira (sem preenchimento) precisa casar com um deles
+MEAN_AGE_PATTERN = re.compile(r'(idade media|media idades?)( clientes)?')
+AGE_RANGE_PATTERN = re.compile(r'idade (minima|maxima|minima maxima|maxima minima)( clientes)?')
+DEFAULT_RATE_PATTERN = re.compile(r'taxa (geral )?inadimplencia( geral)?( clientes)?')
+DEFAULT_COUNT_PATTERN = re.compile(r'quant[oa]s (clientes )?inadimplentes')
+ROW_COUNT_PATTERN = re.compile(r'quant[oa]s (clientes|registros|linhas)( total)?')
+DIMENSION_PATTERN = re.compile(r'(taxa )?inadimpl\w* (por|em cada) (classe social|\w+)')
+
+DIMENSION_KEYWORDS = {
+    'sexo': 'VAR2',
+    'genero': 'VAR2',
+    'uf': 'VAR5',
+    'estado': 'VAR5',
+    'classe social': 'VAR8',
+    'classe': 'VAR8',
+    'obito': 'VAR4',
+    'mes': 'REF_DATE',
+}
+
+
+def normalize_text(text):
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def _parse_dates(series):
+    dates = pd.to_datetime(series, errors='coerce', utc=True)
+    return dates.dt.tz_localize(None)
+
+
+def _categorical_stats(series):
+    counts = series.value_counts(dropna=True)
+    return {
+        'kind': 'categorical',
+        'distinct': int(counts.size),
+        'frequencies': {str(k): int(v) for k, v in counts.items()},
+    }
+
+
+def _numeric_stats(series):
+    values = pd.to_numeric(series, errors='coerce').dropna()
+    if values.empty:
+        return {'kind': 'numeric', 'distinct': 0}
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {
+        'kind': 'numeric',
+        'distinct': int(values.nunique()),
+        'min': float(values.min()),
+        'max': float(values.max()),
+        'mean': float(values.mean()),
+        'quantiles': {f"p{int(q * 100):02d}": float(values.quantile(q)) for q in QUANTILES},
+        'histogram': {'edges': [float(e) for e in edges], 'counts': [int(c) for c in counts]},
+    }
+
+
+def _date_stats(series):
+    dates = _parse_dates(series).dropna()
+    if dates.empty:
+        return {'kind': 'date', 'distinct': 0}
+    monthly = dates.dt.to_period('M').value_counts().sort_index()
+    return {
+        'kind': 'date',
+        'distinct': int(dates.nunique()),
+        'min': dates.min().isoformat(),
+        'max': dates.max().isoformat(),
+        'quantiles': {f"p{int(q * 100):02d}": dates.quantile(q).isoformat() for q in QUANTILES},
+        'histogram': {'edges': [str(p) for p in monthly.index], 'counts': [int(c) for c in monthly.values]},
+    }
+
+
+def _default_rates(df, column):
+    keys = df[column]
+    if column in DATE_COLUMNS:
+        keys = _parse_dates(keys).dt.to_period('M')
+    #Mantém o grupo nulo, como o GROUP BY do SQL, e o coloca primeiro como no ORDER BY do MySQL/SQLite
+    grouped = df['TARGET'].groupby(keys, dropna=False).agg(['count', 'sum'])
+    order = sorted(range(len(grouped)), key=lambda i: not pd.isna(grouped.index[i]))
+    return {
+        (NULL_KEY if pd.isna(k) else str(k)): {'total': int(row['count']), 'inadimplentes': int(row['sum']),
+                                               'taxa': float(row['sum'] / row['count']) if row['count'] else 0.0}
+        for k, row in grouped.iloc[order].iterrows()
+    }
+
+
+def build_statistics_catalog(df):
+    catalog = {'row_count': int(len(df)), 'columns': {}, 'default_rates': {}}
+
+    for col in df.columns:
+        series = df[col]
+        if col in DATE_COLUMNS:
+            stats = _date_stats(series)
+        elif col in NUMERIC_COLUMNS:
+            stats = _numeric_stats(series)
+        else:
+            stats = _categorical_stats(series)
+        stats['nulls'] = int(series.isna().sum())
+        catalog['columns'][col] = stats
+
+    if 'TARGET' in df.columns:
+        target = pd.to_numeric(df['TARGET'], errors='coerce')
+        catalog['default_rate'] = float(target.mean()) if len(target) else 0.0
+        scored = df.assign(TARGET=target).dropna(subset=['TARGET'])
+        for col in DIMENSION_COLUMNS + DATE_COLUMNS:
+            if col in scored.columns:
+                catalog['default_rates'][col] = _default_rates(scored, col)
+
+    return catalog
+
+
+def catalog_path():
+    #Lido a cada chamada para respeitar STATS_CATALOG_PATH definido depois do import (ex.: teste de carga)
+    return os.getenv('STATS_CATALOG_PATH') or DEFAULT_CATALOG_PATH
+
+
+def save_catalog(catalog, path=None):
+    with open(path or catalog_path(), 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+
+
+class StatisticsCatalog:
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.columns = catalog.get('columns', {})
+
+    @classmethod
+    def load(cls, path=None):
+        try:
+            with open(path or catalog_path(), encoding='utf-8') as f:
+                return cls(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def kind(self, column):
+        return self.columns.get(column, {}).get('kind')
+
+    def distinct(self, column):
+        return self.columns.get(column, {}).get('distinct')
+
+    def histogram_edges(self, column):
+        stats = self.columns.get(column, {})
+        if stats.get('kind') != 'numeric':
+            return None
+        return stats.get('histogram', {}).get('edges')
+
+    def to_prompt(self, top_values=5):
+        lines = [f"Total de registros: {self.catalog.get('row_count', 0)}"]
+        if 'default_rate' in self.catalog:
+            lines.append(f"Taxa geral de inadimplência (TARGET=1): {self.catalog['default_rate']:.2%}")
+
+        for col, stats in self.columns.items():
+            parts = [f"nulos={stats.get('nulls', 0)}", f"distintos={stats.get('distinct', 0)}"]
+            if stats['kind'] == 'categorical':
+                freqs = list(stats.get('frequencies', {}).items())[:top_values]
+                values = ', '.join(f"{k} ({v})" for k, v in freqs)
+                suffix = ', ...' if stats.get('distinct', 0) > top_values else ''
+                parts.append(f"valores: {values}{suffix}")
+            elif 'min' in stats:
+                parts.append(f"min={stats['min']}")
+                parts.append(f"mediana={stats['quantiles']['p50']}")
+                parts.append(f"max={stats['max']}")
+            lines.append(f"{col}: " + '; '.join(parts))
+
+        return '\n'.join(lines)
+
+    def answer_question(self, question):
+        """Responde perguntas triviais direto do catálogo. Retorna (sql, DataFrame, texto) ou None."""
+        q = ' '.join(t for t in re.findall(r'\w+', normalize_text(question)) if t not in FILLER_WORDS)
+        idade = self.columns.get('IDADE', {})
+
+        match = DIMENSION_PATTERN.fullmatch(q)
+        if match:
+            column = DIMENSION_KEYWORDS.get(match.group(3))
+            rates = self.catalog.get('default_rates', {}).get(column)
+            if not rates:
+                return None
+            #REF_DATE é agregado por mês no catálogo; o SQL equivalente agrupa pelo mesmo prefixo AAAA-MM
+            group = "SUBSTRING(REF_DATE, 1, 7)" if column in DATE_COLUMNS else column
+            select = f"{group} AS {column}" if group != column else column
+            df = pd.DataFrame([
+                {column: None if k == NULL_KEY else k, 'total': v['total'], 'inadimplentes': v['inadimplentes'], 'taxa_inadimplencia': v['taxa']}
+                for k, v in rates.items()
+            ])
+            #O pandas converte None em NaN; o grupo nulo volta a ser None, como o NULL do SQL
+            df[column] = df[column].astype(object).where(df[column].notna(), None)
+            sql = (f"SELECT {select}, COUNT(*) AS total, SUM(TARGET) AS inadimplentes, "
+                   f"AVG(TARGET) AS taxa_inadimplencia FROM neurotech GROUP BY {group} ORDER BY {group};")
+            return sql, df, f"Inadimplência por {column} obtida do catálogo de estatísticas."
+
+        if MEAN_AGE_PATTERN.fullmatch(q) and 'mean' in idade:
+            df = pd.DataFrame({'media_idade': [idade['mean']]})
+            return "SELECT AVG(IDADE) AS media_idade FROM neurotech;", df, f"A idade média dos clientes é {idade['mean']:.1f} anos."
+
+        if AGE_RANGE_PATTERN.fullmatch(q) and 'min' in idade:
+            df = pd.DataFrame({'idade_minima': [idade['min']], 'idade_maxima': [idade['max']]})
+            return ("SELECT MIN(IDADE) AS idade_minima, MAX(IDADE) AS idade_maxima FROM neurotech;", df,
+                    f"As idades variam de {idade['min']:.0f} a {idade['max']:.0f} anos.")
+
+        if DEFAULT_RATE_PATTERN.fullmatch(q) and 'default_rate' in self.catalog:
+            rate = self.catalog['default_rate']
+            df = pd.DataFrame({'taxa_inadimplencia': [rate]})
+            return "SELECT AVG(TARGET) AS taxa_inadimplencia FROM neurotech;", df, f"A taxa geral de inadimplência é {rate:.2%}."
+
+        freqs = self.columns.get('TARGET', {}).get('frequencies', {})
+        if DEFAULT_COUNT_PATTERN.fullmatch(q) and freqs:
+            total = freqs.get('1', 0)
+            df = pd.DataFrame({'inadimplentes': [total]})
+            return "SELECT COUNT(*) AS inadimplentes FROM neurotech WHERE TARGET = 1;", df, f"Existem {total:,} clientes inadimplentes."
+
+        if ROW_COUNT_PATTERN.fullmatch(q):
+            total = self.catalog.get('row_count', 0)
+            df = pd.DataFrame({'total': [total]})
+            return "SELECT COUNT(*) AS total FROM neurotech;", df, f"A tabela possui {total:,} registros."
+
+        return None
@@ -5,11 +5,21 @@ import sys
 from unittest.mock import Mock, patch, MagicMock
 from sqlalchemy import create_engine
 import tempfile
+import subprocess
+import time
+import importlib.util
+import threading
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from chat import DatabaseChatbot
+from chat import DatabaseChatbot, warm_up
 from visualization_generator import VisualizationGenerator
+from statistics_catalog import StatisticsCatalog, build_statistics_catalog, save_catalog
+from conversation_context import ConversationContext
+from result_export import ResultExporter
+from render_cache import RenderCache, data_fingerprint
+from load_test import StubLLMServer, run_load_test, seed_database
+from sql_candidates import CandidateSelector, SelectionStats, sample_query, parse_explain_cost
 
 class TestDatabaseChatbot(unittest.TestCase):
     """Testes para a classe DatabaseChatbot"""
@@ -28,7 +38,7 @@ class TestDatabaseChatbot(unittest.TestCase):
         self.env_patcher.start()
         
         # Mock do OpenAI client
-        self.openai_patcher = patch('chat.OpenAI')
+        self.openai_patcher = patch('openai.OpenAI')
         self.mock_openai = self.openai_patcher.start()
         
         self.engine_patcher = patch('chat.create_engine')
@@ -47,6 +57,17 @@ class TestDatabaseChatbot(unittest.TestCase):
         self.assertIsNotNone(self.chatbot.openai_client)
         self.assertIsNotNone(self.chatbot.engine)
     
+    def test_clients_created_on_demand(self):
+        """Testa que os clientes do LLM e do banco só são criados no primeiro uso"""
+        self.mock_openai.assert_not_called()
+        self.mock_engine.assert_not_called()
+        
+        self.chatbot.openai_client
+        self.chatbot.openai_client
+        
+        self.mock_openai.assert_called_once()
+        self.mock_engine.assert_not_called()
+    
     @patch('chat.pd.read_sql')
     def test_get_table_schema_success(self, mock_read_sql):
         """Testa obtenção bem-sucedida do schema da tabela"""
@@ -72,6 +93,10 @@ class TestDatabaseChatbot(unittest.TestCase):
         self.assertIsNotNone(sample_df)
         self.assertEqual(len(schema_df), 3)
         self.assertEqual(len(sample_df), 3)
+        
+        #Segunda chamada usa o esquema em memória
+        self.chatbot.get_table_schema()
+        self.assertEqual(mock_read_sql.call_count, 2)
     
     @patch('chat.pd.read_sql')
     def test_get_table_schema_failure(self, mock_read_sql):
@@ -128,6 +153,20 @@ class TestDatabaseChatbot(unittest.TestCase):
         
         self.assertIn("Erro ao gerar SQL", result)
     
+    def test_generate_sql_includes_previous_query(self):
+        """Testa que a consulta anterior é enviada ao LLM em perguntas de refinamento"""
+        mock_response = Mock()
+        mock_response.choices = [Mock()]
+        mock_response.choices[0].message.content = "SELECT 1"
+        create = self.mock_openai.return_value.chat.completions.create
+        create.return_value = mock_response
+        
+        self.chatbot.generate_sql_from_question("agora por mês", "schema", "SELECT VAR5 FROM neurotech")
+        
+        prompt = create.call_args.kwargs['messages'][0]['content']
+        self.assertIn("CONSULTA ANTERIOR", prompt)
+        self.assertIn("SELECT VAR5 FROM neurotech", prompt)
+    
     def test_explain_results_with_dataframe(self):
         """Testa explicação de resultados com DataFrame"""
         mock_response = Mock()
@@ -163,7 +202,7 @@ class TestVisualizationGenerator(unittest.TestCase):
         self.env_patcher = patch.dict(os.environ, {'OPENAI_API_KEY': 'test_key'})
         self.env_patcher.start()
         
-        self.openai_patcher = patch('visualization_generator.OpenAI')
+        self.openai_patcher = patch('openai.OpenAI')
         self.mock_openai = self.openai_patcher.start()
         
         self.viz_generator = VisualizationGenerator()
@@ -257,6 +296,428 @@ class TestVisualizationGenerator(unittest.TestCase):
         self.assertIn("sucesso", message)
 
 
+class TestStatisticsCatalog(unittest.TestCase):
+    """Testes para o catálogo de estatísticas pré-computadas"""
+    
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.df = pd.DataFrame({
+            'REF_DATE': ['2017-06-01 00:00:00+00:00', '2017-06-01 00:00:00+00:00',
+                         '2017-07-01 00:00:00+00:00', '2017-08-01 00:00:00+00:00'],
+            'TARGET': [0, 1, 0, 1],
+            'VAR2': ['M', 'F', 'M', None],
+            'IDADE': [25.0, 35.0, 45.0, 55.0],
+            'VAR5': ['SP', 'RJ', 'SP', 'SP']
+        })
+        self.catalog = StatisticsCatalog(build_statistics_catalog(self.df))
+    
+    def test_build_statistics_catalog(self):
+        """Testa contagens, nulos, frequências e quantis do catálogo"""
+        raw = self.catalog.catalog
+        
+        self.assertEqual(raw['row_count'], 4)
+        self.assertEqual(raw['columns']['VAR2']['nulls'], 1)
+        self.assertEqual(raw['columns']['VAR5']['frequencies'], {'SP': 3, 'RJ': 1})
+        self.assertEqual(raw['columns']['IDADE']['min'], 25.0)
+        self.assertEqual(raw['columns']['IDADE']['quantiles']['p50'], 40.0)
+        self.assertEqual(raw['columns']['REF_DATE']['histogram']['counts'], [2, 1, 1])
+        self.assertAlmostEqual(raw['default_rate'], 0.5)
+        self.assertAlmostEqual(raw['default_rates']['VAR5']['SP']['taxa'], 1 / 3)
+    
+    def test_save_and_load_catalog(self):
+        """Testa persistência do catálogo em JSON"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stats.json')
+            save_catalog(self.catalog.catalog, path)
+            loaded = StatisticsCatalog.load(path)
+        
+        self.assertEqual(loaded.catalog, self.catalog.catalog)
+        self.assertIsNone(StatisticsCatalog.load(os.path.join(tempfile.gettempdir(), 'inexistente.json')))
+    
+    def test_to_prompt_is_compact(self):
+        """Testa resumo do catálogo para o prompt"""
+        prompt = self.catalog.to_prompt()
+        
+        self.assertIn("Total de registros: 4", prompt)
+        self.assertIn("VAR5:", prompt)
+        self.assertLess(len(prompt.splitlines()), 10)
+    
+    def test_answer_question_from_catalog(self):
+        """Testa respostas triviais sem consulta ao banco"""
+        sql, df, text = self.catalog.answer_question("Qual a idade média?")
+        self.assertIn("AVG(IDADE)", sql)
+        self.assertEqual(df.iloc[0, 0], 40.0)
+        
+        sql, df, text = self.catalog.answer_question("Quantos clientes inadimplentes temos?")
+        self.assertEqual(df.iloc[0, 0], 2)
+        
+        sql, df, text = self.catalog.answer_question("Mostre a inadimplência por sexo")
+        self.assertIn("GROUP BY VAR2", sql)
+        self.assertEqual(len(df), 3)
+    
+    def test_answer_question_falls_back_for_filters(self):
+        """Testa que perguntas com filtros não são respondidas pelo catálogo"""
+        self.assertIsNone(self.catalog.answer_question("Qual a idade média dos inadimplentes?"))
+        self.assertIsNone(self.catalog.answer_question("Quantos clientes temos em SP?"))
+        self.assertIsNone(self.catalog.answer_question("Liste os 10 clientes mais velhos"))
+        self.assertIsNone(self.catalog.answer_question("Qual a idade média dos adimplentes?"))
+        self.assertIsNone(self.catalog.answer_question("Quantos clientes adimplentes temos?"))
+        self.assertIsNone(self.catalog.answer_question("Quantos clientes morreram?"))
+        self.assertIsNone(self.catalog.answer_question("Qual a taxa de inadimplência de SP?"))
+        self.assertIsNone(self.catalog.answer_question("Qual a taxa de inadimplência dos jovens?"))
+        self.assertIsNone(self.catalog.answer_question("idade média dos clientes do RJ"))
+    
+    def test_answer_question_keeps_null_group(self):
+        """Testa que a inadimplência por uma dimensão com nulos traz o grupo NULL, como o SQL equivalente"""
+        sql, df, text = self.catalog.answer_question("Mostre a inadimplência por sexo")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'neurotech.db')}")
+            self.df.to_sql('neurotech', engine, index=False)
+            from_db = pd.read_sql(sql, engine)
+            engine.dispose()
+        
+        self.assertIsNone(df['VAR2'].iloc[0])
+        self.assertEqual(df['VAR2'].tolist()[1:], ['F', 'M'])
+        self.assertEqual(from_db['VAR2'].astype(object).where(from_db['VAR2'].notna(), None).tolist(), df['VAR2'].tolist())
+        self.assertEqual(from_db['total'].tolist(), df['total'].tolist())
+        self.assertEqual(from_db['inadimplentes'].tolist(), df['inadimplentes'].tolist())
+    
+    def test_answer_question_by_month_matches_sql(self):
+        """Testa que a inadimplência por mês do catálogo bate com o SQL equivalente"""
+        sql, df, text = self.catalog.answer_question("Qual a inadimplência por mês?")
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{os.path.join(tmp, 'neurotech.db')}")
+            self.df.to_sql('neurotech', engine, index=False)
+            from_db = pd.read_sql(sql, engine)
+            engine.dispose()
+        
+        self.assertEqual(df['REF_DATE'].tolist(), ['2017-06', '2017-07', '2017-08'])
+        self.assertEqual(from_db['REF_DATE'].tolist(), df['REF_DATE'].tolist())
+        self.assertEqual(from_db['inadimplentes'].tolist(), df['inadimplentes'].tolist())
+    
+    @patch('openai.OpenAI')
+    def test_catalog_guides_chart_choice(self, mock_openai):
+        """Testa escolha de gráfico e bins a partir do catálogo"""
+        viz_generator = VisualizationGenerator(self.catalog)
+        
+        counts = pd.DataFrame({'VAR2': ['M', 'F'], 'total': [2, 1]})
+        chart, message = viz_generator.analyze_data_for_visualization("pergunta", "sql", counts)
+        self.assertEqual(chart.data[0].type, "pie")
+        
+        rates = pd.DataFrame({'VAR5': ['SP', 'RJ'], 'taxa': [0.3, 0.5]})
+        chart, message = viz_generator.analyze_data_for_visualization("pergunta", "sql", rates)
+        self.assertEqual(chart.data[0].type, "bar")
+        
+        ages = pd.DataFrame({'IDADE': [float(i) for i in range(20, 60)]})
+        chart, message = viz_generator.analyze_data_for_visualization("pergunta", "sql", ages)
+        self.assertEqual(chart.data[0].xbins.start, 25.0)
+        
+        #Resultado agregado por idade não vira histograma (a contagem já está em `total`)
+        by_age = pd.DataFrame({'IDADE': [float(i) for i in range(20, 60)], 'total': list(range(40))})
+        chart_type, title = viz_generator.choose_chart_type("pergunta", by_age)
+        self.assertNotEqual(chart_type, "histogram")
+
+
+class TestConversationContext(unittest.TestCase):
+    """Testes para refinamentos resolvidos a partir do resultado anterior"""
+    
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.context = ConversationContext()
+        self.context.update(
+            "Inadimplência por UF e sexo",
+            "SELECT VAR5, VAR2, COUNT(*) AS total, AVG(TARGET) AS taxa FROM neurotech GROUP BY VAR5, VAR2;",
+            pd.DataFrame({
+                'VAR5': ['SP', 'SP', 'RJ', 'RJ'],
+                'VAR2': ['F', 'M', 'F', 'M'],
+                'total': [10, 20, 5, 8],
+                'taxa': [0.1, 0.3, 0.2, 0.05]
+            })
+        )
+    
+    def test_no_previous_result(self):
+        """Testa que sem resultado anterior nada é resolvido localmente"""
+        self.assertIsNone(ConversationContext().try_follow_up("agora só para mulheres"))
+    
+    def test_filter_follow_up(self):
+        """Testa filtro local a partir de sinônimos e valores do resultado"""
+        sql, df, text = self.context.try_follow_up("Agora só para mulheres")
+        
+        self.assertEqual(df['VAR2'].tolist(), ['F', 'F'])
+        self.assertIn("WHERE VAR2 = 'F'", sql)
+        self.assertIn("GROUP BY VAR5, VAR2", sql)
+        
+        sql, df, text = self.context.try_follow_up("e para RJ?")
+        self.assertEqual(df['VAR5'].tolist(), ['RJ', 'RJ'])
+    
+    def test_sort_and_top_follow_up(self):
+        """Testa ordenação e top N locais"""
+        sql, df, text = self.context.try_follow_up("ordene por taxa")
+        self.assertEqual(df['taxa'].tolist(), [0.3, 0.2, 0.1, 0.05])
+        self.assertIn("ORDER BY taxa DESC", sql)
+        
+        sql, df, text = self.context.try_follow_up("só para mulheres, top 1")
+        self.assertEqual(len(df), 1)
+        self.assertEqual(df.iloc[0]['VAR5'], 'RJ')
+    
+    def test_falls_back_when_data_missing(self):
+        """Testa que refinamentos fora do resultado anterior voltam ao pipeline completo"""
+        self.assertIsNone(self.context.try_follow_up("só para mulheres acima de 30 anos"))
+        self.assertIsNone(self.context.try_follow_up("agora só inadimplentes"))
+        self.assertIsNone(self.context.try_follow_up("ordene por idade"))
+        self.assertIsNone(self.context.try_follow_up("Qual UF tem mais inadimplência?"))
+        self.assertEqual(self.context.follow_up_sql("agora só inadimplentes"), self.context.last_sql)
+        self.assertIsNone(self.context.follow_up_sql("Qual UF tem mais inadimplência?"))
+    
+    def test_sort_column_must_match_whole_name(self):
+        """Testa que a coluna de ordenação só é resolvida pelo nome inteiro ou por uma parte separada por _"""
+        self.assertIsNone(self.context.try_follow_up("ordene por a"))
+        self.assertIsNone(self.context.try_follow_up("ordene por tot"))
+        
+        self.context.update(
+            "Inadimplência por UF",
+            "SELECT VAR5, AVG(TARGET) AS taxa_inadimplencia FROM neurotech GROUP BY VAR5;",
+            pd.DataFrame({'VAR5': ['SP', 'RJ'], 'taxa_inadimplencia': [0.1, 0.3]})
+        )
+        sql, df, text = self.context.try_follow_up("ordene por inadimplência")
+        self.assertEqual(df['VAR5'].tolist(), ['RJ', 'SP'])
+        self.assertIn("ORDER BY taxa_inadimplencia DESC", sql)
+    
+    def test_top_n_rejects_new_questions(self):
+        """Testa que perguntas novas iniciadas por "top N" não são respondidas com o resultado anterior"""
+        self.assertIsNone(self.context.try_follow_up("Top 10 UFs com mais inadimplência"))
+        self.assertIsNone(self.context.try_follow_up("Top 5 clientes mais velhos"))
+        self.assertIsNone(self.context.try_follow_up("ordene por taxa dos estados do nordeste"))
+        
+        sql, df, text = self.context.try_follow_up("top 2")
+        self.assertEqual(df['taxa'].tolist(), [0.3, 0.2])
+    
+    def test_falls_back_when_previous_result_truncated(self):
+        """Testa que filtros e top N não são aplicados sobre um resultado cortado por LIMIT"""
+        self.context.update(
+            "Quais os 5 clientes mais velhos?",
+            "SELECT VAR2, IDADE FROM neurotech ORDER BY IDADE DESC LIMIT 5;",
+            pd.DataFrame({'VAR2': ['M', 'M', 'F', 'M', 'M'], 'IDADE': [90, 89, 88, 87, 86]})
+        )
+        self.assertIsNone(self.context.try_follow_up("agora só para mulheres"))
+        self.assertIsNone(self.context.try_follow_up("top 10"))
+        
+        sql, df, text = self.context.try_follow_up("ordene por idade crescente")
+        self.assertEqual(df['IDADE'].tolist(), [86, 87, 88, 89, 90])
+        
+        #Resultado menor que o LIMIT está completo e pode ser filtrado
+        self.context.update(
+            "Clientes acima de 85 anos",
+            "SELECT VAR2, IDADE FROM neurotech WHERE IDADE > 85 LIMIT 100;",
+            pd.DataFrame({'VAR2': ['M', 'F'], 'IDADE': [90, 88]})
+        )
+        sql, df, text = self.context.try_follow_up("agora só para mulheres")
+        self.assertEqual(df['IDADE'].tolist(), [88])
+
+
+class TestResultExporter(unittest.TestCase):
+    """Testes para a exportação de resultados em segundo plano"""
+    
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'neurotech.db')}")
+        pd.DataFrame({
+            'VAR5': ['SP', 'RJ', 'MG', 'SP', 'BA', 'SP', 'RJ', 'PR', 'SP', 'SC'],
+            'IDADE': [25, 35, 45, 55, 30, 40, 50, 60, 33, 28],
+            'TARGET': [1, 0, 0, 1, 0, 1, 0, 0, 1, 0]
+        }).to_sql('neurotech', self.engine, index=False)
+        self.exporter = ResultExporter(export_dir=self.tmp.name, chunk_size=3)
+    
+    def tearDown(self):
+        """Limpeza após cada teste"""
+        self.exporter.executor.shutdown(wait=True)
+        self.engine.dispose()
+        self.tmp.cleanup()
+    
+    def test_export_csv_in_chunks(self):
+        """Testa exportação para CSV lendo o resultado em blocos"""
+        job = self.exporter.start(self.engine, "SELECT VAR5, IDADE FROM neurotech WHERE TARGET = 0", "csv")
+        job.future.result(timeout=10)
+        
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.rows, 6)
+        exported = pd.read_csv(job.path)
+        self.assertEqual(exported.columns.tolist(), ['VAR5', 'IDADE'])
+        self.assertEqual(len(exported), 6)
+        self.assertEqual(job.mime_type, 'text/csv')
+    
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow não instalado")
+    def test_export_parquet_in_chunks(self):
+        """Testa exportação para Parquet em vários row groups"""
+        job = self.exporter.start(self.engine, "SELECT * FROM neurotech", "parquet")
+        job.future.result(timeout=10)
+        
+        self.assertEqual(job.status, 'done')
+        exported = pd.read_parquet(job.path)
+        self.assertEqual(len(exported), 10)
+        self.assertEqual(exported['IDADE'].sum(), 401)
+    
+    def test_export_failure(self):
+        """Testa erro de SQL durante a exportação"""
+        job = self.exporter.start(self.engine, "SELECT * FROM tabela_inexistente", "csv")
+        job.future.result(timeout=10)
+        
+        self.assertEqual(job.status, 'error')
+        self.assertIn("Erro na exportação", job.error)
+        self.assertFalse(os.path.exists(job.path))
+    
+    def test_expired_exports_are_removed(self):
+        """Testa que arquivos exportados são apagados após o TTL e o diretório é removido ao encerrar"""
+        job = self.exporter.start(self.engine, "SELECT * FROM neurotech", "csv")
+        job.future.result(timeout=10)
+        
+        self.assertEqual(self.exporter.cleanup(now=job.finished_at + self.exporter.ttl / 2), 0)
+        self.assertTrue(os.path.exists(job.path))
+        
+        self.assertEqual(self.exporter.cleanup(now=job.finished_at + self.exporter.ttl + 1), 1)
+        self.assertEqual(job.status, 'expired')
+        self.assertFalse(os.path.exists(job.path))
+        self.assertEqual(self.exporter.jobs, [])
+        
+        shared = ResultExporter()
+        shared.close()
+        self.assertFalse(os.path.exists(shared.export_dir))
+    
+    def test_invalid_format(self):
+        """Testa formato de exportação não suportado"""
+        with self.assertRaises(ValueError):
+            self.exporter.start(self.engine, "SELECT * FROM neurotech", "xlsx")
+
+
+class TestCandidateSelector(unittest.TestCase):
+    """Testes para a geração de múltiplas SQLs com seleção por custo"""
+    
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.chatbot = Mock()
+        self.stats = SelectionStats()
+        self.selector = CandidateSelector(self.chatbot, 3, "`neurotech`.neurotech", stats=self.stats)
+        self.costs = {}
+        self.fingerprints = {}
+        self.selector.evaluate = lambda sql: {
+            'sql': sql, 'cost': self.costs.get(sql, float('inf')),
+            'fingerprint': self.fingerprints.get(sql), 'error': None if sql in self.costs else "Erro no EXPLAIN"
+        }
+    
+    def test_sample_query_shadows_table(self):
+        """Testa reescrita da query para rodar sobre a amostra"""
+        sql = sample_query("SELECT COUNT(*) FROM neurotech.neurotech WHERE TARGET = 1;", "`db`.neurotech", 100)
+        self.assertEqual(sql, "WITH neurotech AS (SELECT * FROM `db`.neurotech LIMIT 100) SELECT COUNT(*) FROM neurotech WHERE TARGET = 1")
+        
+        sql = sample_query("WITH t AS (SELECT * FROM neurotech) SELECT * FROM t", "`db`.neurotech", 100)
+        self.assertTrue(sql.startswith("WITH neurotech AS (SELECT * FROM `db`.neurotech LIMIT 100), t AS"))
+    
+    def test_parse_explain_cost(self):
+        """Testa leitura do custo estimado do EXPLAIN FORMAT=JSON"""
+        self.assertEqual(parse_explain_cost('{"query_block": {"cost_info": {"query_cost": "12.50"}}}'), 12.5)
+        self.assertEqual(parse_explain_cost('{"query_block": {"union_result": {}}}'), float('inf'))
+    
+    def test_generate_candidates_in_parallel(self):
+        """Testa geração de candidatos com temperaturas diferentes e sem duplicatas"""
+        self.chatbot.generate_sql_from_question.side_effect = lambda q, s, p, temperature: (
+            "SELECT * FROM neurotech" if temperature == 0 else "SELECT VAR2, COUNT(*) FROM neurotech GROUP BY VAR2"
+        )
+        
+        candidates = self.selector.generate("pergunta", "schema")
+        
+        self.assertEqual(self.chatbot.generate_sql_from_question.call_count, 3)
+        self.assertEqual(candidates, ["SELECT * FROM neurotech", "SELECT VAR2, COUNT(*) FROM neurotech GROUP BY VAR2"])
+    
+    def test_select_cheapest_agreeing_candidate(self):
+        """Testa escolha do candidato mais barato entre os que concordam na amostra"""
+        base, cheap, wrong = "SELECT base", "SELECT cheap", "SELECT wrong"
+        self.selector.generate = Mock(return_value=[base, cheap, wrong])
+        self.costs = {base: 100.0, cheap: 40.0, wrong: 1.0}
+        self.fingerprints = {base: 'A', cheap: 'A', wrong: 'B'}
+        
+        self.assertEqual(self.selector.select("pergunta", "schema"), cheap)
+        
+        summary = self.stats.summary()
+        self.assertEqual(summary['selecoes'], 1)
+        self.assertEqual(summary['vitorias_plano_mais_barato'], 1)
+        self.assertEqual(summary['divergencias'], 1)
+        self.assertAlmostEqual(summary['economia_media_custo'], 0.6)
+    
+    def test_evaluate_rejects_non_select(self):
+        """Testa que candidatos que não são SELECT na tabela neurotech nem chegam ao banco"""
+        selector = CandidateSelector(self.chatbot, 3, "`neurotech`.neurotech", stats=self.stats)
+        
+        candidate = selector.evaluate("DELETE FROM neurotech")
+        
+        self.assertIsNotNone(candidate['error'])
+        self.chatbot.engine.connect.assert_not_called()
+    
+    def test_select_falls_back_when_all_invalid(self):
+        """Testa que sem candidatos válidos a SQL de temperatura 0 é usada"""
+        self.selector.generate = Mock(return_value=["SELECT a", "SELECT b"])
+        
+        self.assertEqual(self.selector.select("pergunta", "schema"), "SELECT a")
+        self.assertEqual(self.stats.summary()['selecoes'], 0)
+
+
+class TestRenderCache(unittest.TestCase):
+    """Testes para o cache de figuras e tabelas entre reruns"""
+    
+    def setUp(self):
+        """Configuração inicial para cada teste"""
+        self.df = pd.DataFrame({'VAR2': ['M', 'F'], 'total': [60, 40]})
+    
+    def test_data_fingerprint(self):
+        """Testa que a assinatura muda com o conteúdo e não com a instância"""
+        self.assertEqual(data_fingerprint(self.df), data_fingerprint(self.df.copy()))
+        self.assertNotEqual(data_fingerprint(self.df), data_fingerprint(self.df.assign(total=[61, 40])))
+        self.assertNotEqual(data_fingerprint(self.df), data_fingerprint(self.df.rename(columns={'total': 'qtd'})))
+    
+    @patch('openai.OpenAI')
+    def test_figure_built_once(self, mock_openai):
+        """Testa que a figura é gerada uma vez e depois servida como JSON"""
+        cache = RenderCache()
+        viz_generator = VisualizationGenerator()
+        build = Mock(side_effect=lambda: viz_generator.generate_visualization(self.df, "bar_chart", "Teste"))
+        
+        first, message = cache.figure("figure:1", build)
+        second, _ = cache.figure("figure:1", build)
+        
+        build.assert_called_once()
+        self.assertEqual(first, second)
+        self.assertEqual(second['data'][0]['type'], 'bar')
+        self.assertIn("sucesso", message)
+        self.assertEqual(cache.hits, 1)
+    
+    def test_table_cached_as_arrow(self):
+        """Testa que a tabela Arrow é reaproveitada entre chamadas"""
+        cache = RenderCache()
+        
+        first = cache.table("table:1", self.df)
+        second = cache.table("table:1", self.df)
+        
+        self.assertIs(first, second)
+        self.assertEqual(first.num_rows, 2)
+    
+    def test_memory_budget_evicts_least_recent(self):
+        """Testa remoção por LRU ao exceder o limite de memória"""
+        cache = RenderCache(max_bytes=100)
+        cache.put("a", "x", 40)
+        cache.put("b", "y", 40)
+        cache.get("a")
+        cache.put("c", "z", 40)
+        cache.put("grande", "w", 500)
+        
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertIn("c", cache)
+        self.assertNotIn("grande", cache)
+        self.assertEqual(cache.size, 80)
+
+
 class TestInputValidation(unittest.TestCase):
     """Testes para validação de entradas"""
     
@@ -302,18 +763,22 @@ class TestErrorHandling(unittest.TestCase):
         """Testa falha de conexão com banco de dados"""
         with patch('chat.create_engine') as mock_engine:
             mock_engine.side_effect = Exception("Falha de conexão")
+            chatbot = DatabaseChatbot()
             
             with self.assertRaises(Exception):
-                DatabaseChatbot()
+                chatbot.engine
+            self.assertIn("Erro na execução da query", chatbot.execute_sql_query("SELECT 1"))
     
     def test_openai_api_failure(self):
         """Testa falha da API do OpenAI"""
         with patch.dict(os.environ, {'OPENAI_API_KEY': 'invalid_key'}):
-            with patch('chat.OpenAI') as mock_openai:
+            with patch('openai.OpenAI') as mock_openai:
                 mock_openai.side_effect = Exception("API Key inválida")
+                chatbot = DatabaseChatbot()
                 
                 with self.assertRaises(Exception):
-                    DatabaseChatbot()
+                    chatbot.openai_client
+                self.assertIn("Erro ao gerar SQL", chatbot.generate_sql_from_question("pergunta", "schema"))
     
     def test_missing_environment_variables(self):
         """Testa variáveis de ambiente ausentes"""
@@ -386,6 +851,136 @@ class TestPerformance(unittest.TestCase):
         self.assertGreater(memory_usage, 0)
 
 
+#Medições de inicialização registradas pelos testes e exibidas no relatório
+COLD_START_METRICS = {}
+
+
+class TestColdStart(unittest.TestCase):
+    """Testes de tempo de importação e de primeira resposta"""
+    
+    def test_import_time(self):
+        """Testa que importar o app não carrega plotly.express, statsmodels nem openai"""
+        script = (
+            "import sys, time; t = time.perf_counter(); import chat; elapsed = time.perf_counter() - t; "
+            "loaded = [m for m in ['openai', 'plotly.express', 'statsmodels'] if m in sys.modules]; "
+            "print(f'{elapsed};{\",\".join(loaded)}')"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip().splitlines()[-1]
+        
+        import_time, loaded = output.split(";")
+        import_time = float(import_time)
+        COLD_START_METRICS['Tempo de importação (s)'] = import_time
+        
+        self.assertEqual(loaded, "")
+        self.assertLess(import_time, 10.0)
+    
+    def test_time_to_first_answer(self):
+        """Testa o tempo da criação do chatbot até a primeira resposta com gráfico.
+
+        Usa o stub do LLM e um SQLite locais: mede o custo do próprio app (clientes, esquema, consulta,
+        gráfico e explicação), sem a latência de rede da OpenAI e do MySQL.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'neurotech.db')
+            seed_database(db_path, 2000)
+            stub = StubLLMServer().start()
+            try:
+                with patch.dict(os.environ, {'OPENAI_API_KEY': 'stub', 'OPENAI_BASE_URL': stub.base_url}), \
+                        patch('chat.DATABASE_URL', f"sqlite:///{db_path}"):
+                    start_time = time.perf_counter()
+                    
+                    chatbot = DatabaseChatbot()
+                    viz_generator = VisualizationGenerator()
+                    schema_df, sample_df = chatbot.get_table_schema()
+                    sql_query = chatbot.generate_sql_from_question("Clientes por sexo", chatbot.build_schema_info(schema_df))
+                    data = chatbot.execute_sql_query(sql_query)
+                    chart, message = viz_generator.analyze_data_for_visualization("Clientes por sexo", sql_query, data)
+                    chatbot.explain_results("Clientes por sexo", sql_query, data)
+                    
+                    elapsed = time.perf_counter() - start_time
+                    chatbot.engine.dispose()
+            finally:
+                stub.stop()
+        
+        COLD_START_METRICS['Tempo até a primeira resposta (s)'] = elapsed
+        
+        self.assertEqual(stub.requests, 2)
+        self.assertEqual(sorted(data['VAR2']), ['F', 'M'])
+        self.assertIsNotNone(chart)
+        self.assertLess(elapsed, 10.0)
+    
+    @patch('chat.create_engine')
+    @patch('openai.OpenAI')
+    def test_warm_up_races_first_question(self, mock_openai, mock_engine):
+        """Testa que o warm-up e a primeira pergunta não criam os clientes duas vezes"""
+        #Criação lenta para que as duas threads cheguem juntas nas propriedades
+        mock_openai.side_effect = lambda **kwargs: time.sleep(0.1) or Mock()
+        mock_engine.side_effect = lambda url: time.sleep(0.1) or Mock()
+        chatbot = DatabaseChatbot()
+        
+        with patch('chat.load_plotting'), patch.object(chatbot, 'load_table_schema', side_effect=lambda: chatbot.engine):
+            thread = threading.Thread(target=warm_up, args=(chatbot,))
+            thread.start()
+            chatbot.engine
+            chatbot.openai_client
+            thread.join()
+        
+        mock_openai.assert_called_once()
+        mock_engine.assert_called_once()
+    
+    @patch('chat.st.error')
+    @patch('chat.create_engine')
+    def test_warm_up_logs_failures(self, mock_engine, mock_st_error):
+        """Testa que falhas no warm-up vão para o log, sem chamar o Streamlit fora do contexto da página"""
+        mock_engine.side_effect = Exception("Banco indisponível")
+        
+        with self.assertLogs('chat', level='WARNING') as logs:
+            warm_up(DatabaseChatbot())
+        
+        self.assertIn("Banco indisponível", logs.output[0])
+        mock_st_error.assert_not_called()
+
+
+class TestLoadTest(unittest.TestCase):
+    """Testes do harness de carga com LLM e banco locais"""
+    
+    def test_stub_llm_server(self):
+        """Testa que o stub responde no formato da API de chat da OpenAI"""
+        import json
+        import urllib.request
+        
+        stub = StubLLMServer().start()
+        try:
+            request = urllib.request.Request(
+                f"{stub.base_url}/chat/completions",
+                data=json.dumps({"messages": [{"role": "user", "content": "PERGUNTA DO USUÁRIO: por UF\nSQL:"}]}).encode(),
+                headers={"Content-Type": "application/json"}
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                body = json.loads(response.read())
+        finally:
+            stub.stop()
+        
+        self.assertIn("GROUP BY VAR5", body["choices"][0]["message"]["content"])
+        self.assertEqual(stub.requests, 1)
+    
+    def test_load_test_ramp(self):
+        """Testa uma rampa curta de sessões simultâneas pelo fluxo real de main()"""
+        with tempfile.TemporaryDirectory() as tmp:
+            results = run_load_test([1, 2], questions_per_session=2, llm_latency=0, rows=500, work_dir=tmp)
+        
+        self.assertEqual([r['sessoes'] for r in results], [1, 2])
+        self.assertEqual([r['perguntas'] for r in results], [2, 4])
+        self.assertEqual(sum(r['erros'] for r in results), 0)
+        self.assertEqual([r['sessoes_com_catalogo'] for r in results], [1, 2])
+        self.assertGreater(results[-1]['vazao_por_s'], 0)
+        self.assertGreaterEqual(results[-1]['p99_s'], results[-1]['p50_s'])
+        self.assertNotIn('DATABASE_URL', os.environ)
+
+
 def run_robustness_tests():
     """Função principal para executar todos os testes"""
     test_suite = unittest.TestSuite()
@@ -394,10 +989,17 @@ def run_robustness_tests():
     test_classes = [
         TestDatabaseChatbot,
         TestVisualizationGenerator,
+        TestStatisticsCatalog,
+        TestConversationContext,
+        TestResultExporter,
+        TestCandidateSelector,
+        TestRenderCache,
         TestInputValidation,
         TestErrorHandling,
         TestDataIntegrity,
-        TestPerformance
+        TestPerformance,
+        TestColdStart,
+        TestLoadTest
     ]
     
     for test_class in test_classes:
@@ -415,6 +1017,9 @@ def run_robustness_tests():
     print(f"Erros: {len(result.errors)}")
     print(f"Taxa de sucesso: {((result.testsRun - len(result.failures) - len(result.errors)) / result.testsRun * 100):.1f}%")
     
+    for name, value in COLD_START_METRICS.items():
+        print(f"{name}: {value:.3f}")
+    
     if result.failures:
         print(f"\nFALHAS ({len(result.failures)}):")
         for failure in result.failures:
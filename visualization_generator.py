@@ -1,29 +1,87 @@
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-from openai import OpenAI
 import os
+import importlib.util
+from functools import lru_cache
+from render_cache import data_fingerprint
+
+HISTOGRAM_MIN_ROWS = 20
+PIE_MAX_CATEGORIES = 5
+
+#plotly e statsmodels são importados só quando o primeiro gráfico é gerado
+def _plotly_express():
+    import plotly.express as px
+    return px
+
+@lru_cache(maxsize=None)
+def _has_statsmodels():
+    return importlib.util.find_spec("statsmodels") is not None
+
+def load_plotting():
+    _plotly_express()
+    if _has_statsmodels():
+        import statsmodels.api
 
 class VisualizationGenerator:
-    def __init__(self):
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-    def analyze_data_for_visualization(self, question, sql_query, data):
-        if data is None or len(data) == 0:
-            return None, "Não há dados para visualizar"
+    def __init__(self, catalog=None):
+        self._openai_client = None
+        self.catalog = catalog
+    
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            from openai import OpenAI
+            self._openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._openai_client
         
+    def choose_chart_type(self, question, data):
         numeric_columns = data.select_dtypes(include=['int64', 'float64']).columns.tolist()
         categorical_columns = data.select_dtypes(include=['object', 'category']).columns.tolist()
         
+        if self.catalog is not None:
+            chart_type = self._chart_type_from_catalog(data)
+            if chart_type is not None:
+                return chart_type, question
+        
         #Lógica para determinar o tipo de gráfico
         if 'TARGET' in data.columns and 'IDADE' in data.columns:
-            return self._create_histogram(data, "Distribuição de Idade por Status de Inadimplência")
+            return "histogram", "Distribuição de Idade por Status de Inadimplência"
         elif len(numeric_columns) >= 2:
-            return self._create_scatter_plot(data, "Relação entre Variáveis Numéricas")
+            return "scatter_plot", "Relação entre Variáveis Numéricas"
         elif len(categorical_columns) >= 1:
-            return self._create_bar_chart(data, "Distribuição de Categorias")
-        else:
+            return "bar_chart", "Distribuição de Categorias"
+        return None, None
+    
+    def analyze_data_for_visualization(self, question, sql_query, data):
+        if data is None or len(data) == 0:
+            return None, "Não há dados para visualizar"
+        
+        chart_type, title = self.choose_chart_type(question, data)
+        if chart_type is None:
             return None, "Visualização em tabela é mais apropriada para estes dados"
+        return self.generate_visualization(data, chart_type, title)
+    
+    def _chart_type_from_catalog(self, data):
+        columns = data.columns.tolist()
+        #Histograma só para linhas individuais; resultados agregados (ex.: IDADE, total) já trazem a contagem
+        measures = [c for c in data.select_dtypes(include='number').columns if c not in ('IDADE', 'TARGET')]
+        if 'IDADE' in columns and len(data) > HISTOGRAM_MIN_ROWS and not measures:
+            return "histogram"
+        if len(columns) < 2 or not pd.api.types.is_numeric_dtype(data[columns[1]]):
+            return None
+        
+        kind = self.catalog.kind(columns[0])
+        if kind == "date":
+            return "line_chart"
+        if kind == "categorical":
+            #Pizza só faz sentido para contagens (partes de um todo), não para taxas
+            is_count = pd.api.types.is_integer_dtype(data[columns[1]]) and data[columns[1]].min() >= 0
+            if is_count and (self.catalog.distinct(columns[0]) or 0) <= PIE_MAX_CATEGORIES:
+                return "pie_chart"
+            return "bar_chart"
+        if kind == "numeric":
+            return "bar_chart"
+        return None
     
     def generate_visualization(self, data, chart_type, question):
         try:
@@ -48,6 +106,7 @@ class VisualizationGenerator:
     def _create_bar_chart(self, data, question):
         if len(data.columns) >= 2:
             x_col, y_col = data.columns[:2]
+            px = _plotly_express()
             fig = px.bar(data, x=x_col, y=y_col, title=f"Gráfico de Barras: {question}")
             fig.update_layout(xaxis_tickangle=-45)
             return fig, "Gráfico de barras gerado com sucesso"
@@ -56,6 +115,7 @@ class VisualizationGenerator:
     def _create_pie_chart(self, data, question):
         if len(data.columns) >= 2:
             labels_col, values_col = data.columns[:2]
+            px = _plotly_express()
             fig = px.pie(data, names=labels_col, values=values_col, title=f"Distribuição: {question}")
             return fig, "Gráfico de pizza gerado com sucesso"
         return None, "Dados insuficientes para gráfico de pizza"
@@ -63,15 +123,22 @@ class VisualizationGenerator:
     def _create_line_chart(self, data, question):
         if len(data.columns) >= 2:
             x_col, y_col = data.columns[:2]
+            px = _plotly_express()
             fig = px.line(data, x=x_col, y=y_col, title=f"Tendência: {question}", markers=True)
             return fig, "Gráfico de linha gerado com sucesso"
         return None, "Dados insuficientes para gráfico de linha"
     
     def _create_histogram(self, data, question):
         numeric_cols = data.select_dtypes(include=['int64', 'float64']).columns
-        if numeric_cols:
-            col = numeric_cols[0]
-            fig = px.histogram(data, x=col, title=f"Distribuição de {col}: {question}", nbins=20)
+        if len(numeric_cols) > 0:
+            col = 'IDADE' if 'IDADE' in numeric_cols else numeric_cols[0]
+            color = 'TARGET' if 'TARGET' in data.columns and col != 'TARGET' else None
+            px = _plotly_express()
+            fig = px.histogram(data, x=col, color=color, title=f"Distribuição de {col}: {question}", nbins=20)
+            edges = self.catalog.histogram_edges(col) if self.catalog is not None else None
+            if edges:
+                #Usa os mesmos bins da distribuição completa da tabela
+                fig.update_traces(xbins=dict(start=edges[0], end=edges[-1], size=edges[1] - edges[0]))
             return fig, "Histograma gerado com sucesso"
         return None, "Nenhuma coluna numérica encontrada para histograma"
     
@@ -79,7 +146,10 @@ class VisualizationGenerator:
         numeric_cols = data.select_dtypes(include=['int64', 'float64']).columns
         if len(numeric_cols) >= 2:
             x_col, y_col = numeric_cols[:2]
-            fig = px.scatter(data, x=x_col, y=y_col, title=f"Relação: {x_col} vs {y_col}", trendline="ols")
+            #A linha de tendência OLS depende do statsmodels, que é opcional
+            trendline = "ols" if _has_statsmodels() else None
+            px = _plotly_express()
+            fig = px.scatter(data, x=x_col, y=y_col, title=f"Relação: {x_col} vs {y_col}", trendline=trendline)
             return fig, "Gráfico de dispersão gerado com sucesso"
         return None, "Necessárias pelo menos 2 colunas numéricas para dispersão"
     
@@ -95,15 +165,25 @@ class VisualizationGenerator:
                 }
         return metrics, "Métricas calculadas com sucesso"
 
-def display_visualization(viz_generator, question, sql_query, data):
+def display_visualization(viz_generator, question, sql_query, data, cache=None, cache_key=None, key=None):
+    """Exibe o gráfico do resultado e retorna a chave usada no cache de renderização."""
     if data is None or len(data) == 0:
         st.warning("Não há dados para visualizar")
-        return
+        return None
     
-    chart, message = viz_generator.analyze_data_for_visualization(question, sql_query, data)
+    if cache is None:
+        chart, message = viz_generator.analyze_data_for_visualization(question, sql_query, data)
+    else:
+        if cache_key is None:
+            chart_type, title = viz_generator.choose_chart_type(question, data)
+            cache_key = f"figure:{data_fingerprint(data)}:{chart_type}:{title}"
+        chart, message = cache.figure(
+            cache_key, lambda: viz_generator.analyze_data_for_visualization(question, sql_query, data)
+        )
     
     if chart is not None:
-        if isinstance(chart, dict):
+        #Figuras vindas do cache são dicts JSON do plotly (com "layout"); métricas são dicts por coluna
+        if isinstance(chart, dict) and 'layout' not in chart:
             st.subheader("Métricas")
             cols = st.columns(len(chart))
             for i, (key, value) in enumerate(chart.items()):
@@ -112,7 +192,7 @@ def display_visualization(viz_generator, question, sql_query, data):
                     st.metric(f"{key} - Média", f"{value['Média']:,.2f}")
         else:
             st.subheader("Visualização")
-            st.plotly_chart(chart, use_container_width=True)
+            st.plotly_chart(chart, use_container_width=True, key=key)
     
     st.info(message)
-
+    return cache_key